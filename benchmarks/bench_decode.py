@@ -0,0 +1,62 @@
+"""Decode throughput of make_bsor against the old field-by-field record decoding.
+
+    PYTHONPATH=src python benchmarks/bench_decode.py
+"""
+import timeit
+from io import BytesIO
+
+from bsor.Bsor import *
+from synthetic import synthetic_bytes
+
+
+def per_field_vr_object(f) -> VRObject:
+    v = VRObject()
+    v.x, v.y, v.z = decode_float(f), decode_float(f), decode_float(f)
+    v.x_rot, v.y_rot, v.z_rot, v.w_rot = decode_float(f), decode_float(f), decode_float(f), decode_float(f)
+    return v
+
+
+def per_field_frame(f) -> Frame:
+    fr = Frame()
+    fr.time = decode_float(f)
+    fr.fps = decode_int(f)
+    fr.head = per_field_vr_object(f)
+    fr.left_hand = per_field_vr_object(f)
+    fr.right_hand = per_field_vr_object(f)
+    return fr
+
+
+def frames_section(data: bytes) -> BytesIO:
+    f = BytesIO(data)
+    decode_int(f)
+    decode_byte(f)
+    make_info(f)
+    return f
+
+
+def bench(frames: int, repeat: int = 5):
+    data = synthetic_bytes(frames=frames, notes=frames // 10, walls=frames // 500)
+    start = frames_section(data).tell()
+
+    def run_per_field():
+        f = BytesIO(data)
+        f.seek(start + 1)
+        make_things(f, per_field_frame)
+
+    def run_struct():
+        f = BytesIO(data)
+        f.seek(start + 1)
+        make_things(f, make_frame)
+
+    per_field = min(timeit.repeat(run_per_field, number=1, repeat=repeat))
+    packed = min(timeit.repeat(run_struct, number=1, repeat=repeat))
+    full = min(timeit.repeat(lambda: make_bsor(BytesIO(data)), number=1, repeat=repeat))
+    columnar = min(timeit.repeat(lambda: make_bsor(BytesIO(data), frames='numpy'), number=1, repeat=repeat))
+    print(f'{frames:>7} frames: per-field {per_field * 1000:8.1f} ms, struct {packed * 1000:8.1f} ms '
+          f'({per_field / packed:4.1f}x), make_bsor {full * 1000:8.1f} ms, '
+          f'make_bsor(frames="numpy") {columnar * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    for n in (1000, 10000, 50000):
+        bench(n)
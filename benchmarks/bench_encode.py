@@ -0,0 +1,42 @@
+"""Bsor.write throughput against writing every record through write_things.
+
+    PYTHONPATH=src python benchmarks/bench_encode.py
+"""
+import timeit
+from io import BytesIO
+
+from bsor.Bsor import *
+from synthetic import synthetic_bsor
+
+
+def write_per_record(m: Bsor, f):
+    # previous Bsor.write, one small f.write per field
+    encode_int(f, m.magic_number)
+    encode_byte(f, m.file_version)
+    m.info.write(f)
+    write_things(f, m.frames, magic=1)
+    write_things(f, m.notes, magic=2)
+    write_things(f, m.walls, magic=3)
+    write_things(f, m.heights, magic=4)
+    write_things(f, m.pauses, magic=5)
+    encode_byte(f, 6)
+    m.controller_offsets.write(f)
+    write_things(f, m.user_data, magic=7)
+
+
+def bench(frames: int, repeat: int = 5):
+    m = synthetic_bsor(frames=frames, notes=frames // 10, walls=frames // 500)
+    old, new = BytesIO(), BytesIO()
+    write_per_record(m, old)
+    m.write(new)
+    assert old.getvalue() == new.getvalue()
+    size = len(new.getvalue())
+    per_record = min(timeit.repeat(lambda: write_per_record(m, BytesIO()), number=1, repeat=repeat))
+    bulk = min(timeit.repeat(lambda: m.write(BytesIO()), number=1, repeat=repeat))
+    print(f'{frames:>7} frames: write_things {per_record * 1000:8.1f} ms ({size / per_record / 1e6:6.1f} MB/s), '
+          f'Bsor.write {bulk * 1000:7.1f} ms ({size / bulk / 1e6:6.1f} MB/s), {per_record / bulk:4.1f}x')
+
+
+if __name__ == '__main__':
+    for n in (1000, 10000, 50000):
+        bench(n)
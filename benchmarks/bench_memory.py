@@ -0,0 +1,65 @@
+"""Retained memory of a decoded replay, measured with tracemalloc: the slotted model classes against
+the same objects stored with a __dict__ each (as before __slots__) and against frames="numpy".
+
+    PYTHONPATH=src python benchmarks/bench_memory.py
+"""
+import tracemalloc
+from io import BytesIO
+
+from bsor.Bsor import *
+from synthetic import synthetic_bytes
+
+
+class DictBacked:
+    # stand-in for the model classes before __slots__: attributes in a per-instance __dict__
+    pass
+
+
+def dict_backed(o):
+    if isinstance(o, (list, tuple)):
+        return [dict_backed(v) for v in o]  # cut vectors were lists too
+    slots = [name for cls in type(o).__mro__ for name in getattr(cls, '__slots__', ())]
+    if not slots:
+        return o
+    copy = DictBacked()
+    for name in slots:
+        if hasattr(o, name):
+            setattr(copy, name, dict_backed(getattr(o, name)))
+    return copy
+
+
+def make_dict_backed_bsor(f) -> Bsor:
+    m = make_bsor(f)
+    for name in ('frames', 'notes', 'walls', 'heights', 'pauses'):
+        setattr(m, name, dict_backed(getattr(m, name)))
+    return m
+
+
+def retained(decode) -> int:
+    tracemalloc.start()
+    try:
+        result = decode()
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return current
+
+
+def bench(frames: int):
+    data = synthetic_bytes(frames=frames, notes=frames // 10, walls=frames // 500)
+    dicts = retained(lambda: make_dict_backed_bsor(BytesIO(data)))
+    objects = retained(lambda: make_bsor(BytesIO(data)))
+    columnar = retained(lambda: make_bsor(BytesIO(data), frames='numpy'))
+    print(f'{frames:>7} frames, {len(data) / 1e6:6.1f} MB file: __dict__ {dicts / 1e6:7.1f} MB, '
+          f'__slots__ {objects / 1e6:7.1f} MB ({(dicts - objects) / 1e6:5.1f} MB less, '
+          f'{(dicts - objects) / frames:4.0f} B/frame), frames="numpy" {columnar / 1e6:7.1f} MB')
+
+
+if __name__ == '__main__':
+    m = make_bsor(BytesIO(synthetic_bytes(frames=10, notes=10)))
+    for o in [m.frames[0], m.frames[0].head, m.notes[0], m.walls[0], m.heights[0], m.pauses[0]]:
+        assert not hasattr(o, '__dict__'), f'{type(o).__name__} should not have a __dict__'
+    make_bsor(BytesIO(synthetic_bytes(frames=10, notes=10)), frames='numpy')  # numpy import is not part of the replay
+    for n in (10000, 40000):
+        bench(n)
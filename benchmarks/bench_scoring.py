@@ -0,0 +1,50 @@
+"""Note scoring: calc_note_score per note against the vectorized calc_note_scores,
+and calc_stats against the columnar calc_stats_columns.
+
+    PYTHONPATH=src python benchmarks/bench_scoring.py
+"""
+import timeit
+from io import BytesIO
+
+from bsor.Bsor import *
+from bsor.Scoring import calc_stats
+from bsor.VectorScoring import calc_note_scores, score_notes, calc_stats_columns, calc_stats_columnar
+from synthetic import synthetic_bytes
+
+
+def bench(notes: int, repeat: int = 5):
+    m = make_bsor(BytesIO(synthetic_bytes(frames=10, notes=notes)))
+    cut_notes = [n for n in m.notes if n.cut is not None]
+    before = [n.cut.beforeCutRating for n in cut_notes]
+    after = [n.cut.afterCutRating for n in cut_notes]
+    distance = [n.cut.cutDistanceToCenter for n in cut_notes]
+    types = [n.scoringType for n in cut_notes]
+    valid = [n.cut.directionOk and n.cut.saberTypeOk and n.cut.speedOK for n in cut_notes]
+
+    scalar = min(timeit.repeat(lambda: [calc_note_score(n.cut, n.scoringType) for n in cut_notes],
+                               number=1, repeat=repeat))
+    vector = min(timeit.repeat(lambda: calc_note_scores(before, after, distance, types, valid),
+                               number=1, repeat=repeat))
+    from_notes = min(timeit.repeat(lambda: score_notes(m.notes), number=1, repeat=repeat))
+    print(f'{notes:>7} notes: calc_note_score {scalar * 1000:7.1f} ms, calc_note_scores {vector * 1000:6.2f} ms '
+          f'({scalar / vector:5.1f}x), score_notes {from_notes * 1000:6.1f} ms')
+
+
+def bench_stats(notes: int, repeat: int = 5):
+    m = make_bsor(BytesIO(synthetic_bytes(frames=10, notes=notes, walls=notes // 100)))
+    assert list(calc_stats(m).score_at_time) == list(calc_stats_columnar(m).score_at_time)
+    columns = ([n.event_time for n in m.notes], [n.scoringType for n in m.notes], [n.event_type for n in m.notes],
+               [n.colorType for n in m.notes], [0 if n.cut is None else n.cut.saberType for n in m.notes],
+               [n.score for n in m.notes], [w.time for w in m.walls])
+    scalar = min(timeit.repeat(lambda: calc_stats(m), number=1, repeat=repeat))
+    columnar = min(timeit.repeat(lambda: calc_stats_columnar(m), number=1, repeat=repeat))
+    arrays = min(timeit.repeat(lambda: calc_stats_columns(*columns), number=1, repeat=repeat))
+    print(f'{notes:>7} notes: calc_stats {scalar * 1000:7.1f} ms, calc_stats_columnar {columnar * 1000:6.1f} ms '
+          f'({scalar / columnar:4.1f}x), calc_stats_columns {arrays * 1000:6.1f} ms ({scalar / arrays:4.1f}x)')
+
+
+if __name__ == '__main__':
+    for n in (1000, 10000, 100000):
+        bench(n)
+    for n in (1000, 10000, 100000):
+        bench_stats(n)
@@ -0,0 +1,50 @@
+"""Handing parsed replays back from parse_many workers: pickled Bsor objects against share_bsor handles.
+
+The shared memory blocks are attached after the process pool has exited, which only works when the
+workers do not clean them up on shutdown.
+
+    PYTHONPATH=src python benchmarks/bench_shared.py
+"""
+import os
+import tempfile
+import time
+
+from bsor.Bsor import *
+from bsor.Columnar import share_bsor
+from bsor.Parallel import parse_many
+from synthetic import synthetic_bytes
+
+
+def bench(paths, workers: int = 2):
+    start = time.perf_counter()
+    pickled = parse_many(paths, workers=workers)
+    objects = time.perf_counter() - start
+
+    start = time.perf_counter()
+    shared = parse_many(paths, workers=workers, reducer=share_bsor)
+    handles = time.perf_counter() - start
+    # the pool is gone here
+    start = time.perf_counter()
+    for p, s in zip(pickled.results, shared.results):
+        assert s.ok, s.error
+        replay = s.value.attach()
+        try:
+            assert len(replay.frames) == len(p.value.frames) and len(replay.notes) == len(p.value.notes)
+            assert str(replay.to_bsor()) == str(p.value)
+        finally:
+            replay.close()
+            s.value.unlink()
+    attach = time.perf_counter() - start
+    print(f'{len(paths)} files, {workers} workers: pickled Bsor {objects:6.2f} s, '
+          f'share_bsor {handles:6.2f} s + attach and check {attach:6.2f} s')
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(8):
+            path = os.path.join(directory, f'{i}.bsor')
+            with open(path, 'wb') as f:
+                f.write(synthetic_bytes(frames=10000, notes=1000, seed=i))
+            paths.append(path)
+        bench(paths)
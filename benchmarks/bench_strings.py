@@ -0,0 +1,71 @@
+"""decode_string_maybe_utf16 on long names whose length prefix is too short.
+
+    PYTHONPATH=src python benchmarks/bench_strings.py
+"""
+import io
+import timeit
+
+from bsor.Decoder import *
+
+
+def byte_by_byte(fa) -> str:
+    # previous implementation, one seek and two reads per extra byte
+    length = decode_int(fa)
+    if length == 0:
+        return ''
+    result = list(fa.read(length))
+    next_string_len = decode_int(fa)
+    while next_string_len < 0 or next_string_len > 100:
+        fa.seek(-4, 1)
+        result.append(decode_byte(fa))
+        next_string_len = decode_int(fa)
+    fa.seek(-4, 1)
+    return bytes(result).decode("utf-8")
+
+
+class CountingRaw(io.RawIOBase):
+    """Unbuffered stream that counts read and seek calls."""
+
+    def __init__(self, data: bytes):
+        self.inner = io.BytesIO(data)
+        self.calls = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        self.calls += 1
+        return self.inner.readinto(b)
+
+    def seek(self, offset, whence=0):
+        self.calls += 1
+        return self.inner.seek(offset, whence)
+
+    def tell(self):
+        return self.inner.tell()
+
+
+def malformed(chars: int) -> bytes:
+    name = ('äöü漢字' * chars)[:chars].encode('utf-8')
+    # prefix counts characters instead of bytes, like the broken names in old replays
+    return chars.to_bytes(4, 'little') + name + (5).to_bytes(4, 'little') + b'steam'
+
+
+def bench(chars: int):
+    data = malformed(chars)
+    assert byte_by_byte(io.BytesIO(data)) == decode_string_maybe_utf16(io.BytesIO(data))
+    old = min(timeit.repeat(lambda: byte_by_byte(io.BytesIO(data)), number=100, repeat=5)) / 100
+    new = min(timeit.repeat(lambda: decode_string_maybe_utf16(io.BytesIO(data)), number=100, repeat=5)) / 100
+    old_raw, new_raw = CountingRaw(data), CountingRaw(data)
+    byte_by_byte(old_raw)
+    decode_string_maybe_utf16(new_raw)
+    print(f'{chars:>6} chars: byte-by-byte {old * 1e6:9.1f} us ({old_raw.calls:>6} calls unbuffered), '
+          f'read-ahead {new * 1e6:7.1f} us ({new_raw.calls:>3} calls), {old / new:5.1f}x')
+
+
+if __name__ == '__main__':
+    for n in (16, 100, 1000, 10000):
+        bench(n)
@@ -0,0 +1,127 @@
+"""Regression suite: decode, encode, calc_stats, JSON export and round trip throughput and peak memory
+over a few synthetic replay sizes, written as one JSON object per measurement.
+
+    PYTHONPATH=src python benchmarks/suite.py --out results.json
+    PYTHONPATH=src python benchmarks/suite.py --compare results.json --tolerance 0.25
+
+With --compare the run exits with status 1 if a measurement got slower (or used more memory)
+than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+from io import BytesIO
+
+from bsor.Bsor import *
+from bsor.JsonExport import write_json
+from bsor.Scoring import calc_stats
+from synthetic import synthetic_bytes
+
+SIZES = {
+    'small': dict(frames=2000, notes=200, walls=5, user_data=1, tricks_segments=2),
+    'medium': dict(frames=20000, notes=1500, walls=40, user_data=2, tricks_segments=10),
+    'large': dict(frames=80000, notes=5000, walls=150, user_data=4, tricks_segments=40),
+}
+
+
+def _write(m: Bsor) -> bytes:
+    out = BytesIO()
+    m.write(out)
+    return out.getvalue()
+
+
+class _Discard:
+    # keeps the exported text out of the peak memory of json_export
+    def write(self, s: str) -> int:
+        return len(s)
+
+
+def _json(m: Bsor):
+    write_json(m, _Discard())
+
+
+def cases(data: bytes) -> dict:
+    # every case is a zero argument callable, setup that is not measured happens here
+    m = make_bsor(BytesIO(data))
+    m_numpy = make_bsor(BytesIO(data), frames=FRAMES_NUMPY)
+    return {
+        'decode': lambda: make_bsor(BytesIO(data)),
+        'decode_numpy': lambda: make_bsor(BytesIO(data), frames=FRAMES_NUMPY),
+        'encode': lambda: _write(m),
+        'calc_stats': lambda: calc_stats(m),
+        'json_export': lambda: _json(m),
+        'json_export_numpy': lambda: _json(m_numpy),
+        'round_trip': lambda: _write(make_bsor(BytesIO(data))),
+    }
+
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(sizes, repeat: int):
+    for size in sizes:
+        data = synthetic_bytes(**SIZES[size])
+        for name, fn in cases(data).items():
+            fn()  # warm up, e.g. the numpy import
+            seconds = min(timeit.repeat(fn, number=1, repeat=repeat))
+            yield {
+                'case': name,
+                'size': size,
+                'bytes': len(data),
+                'seconds': seconds,
+                'mb_per_second': len(data) / seconds / 1e6,
+                'peak_bytes': peak_memory(fn),
+            }
+
+
+def compare(results, baseline, tolerance: float) -> list:
+    old = {(r['case'], r['size']): r for r in baseline}
+    regressions = []
+    for r in results:
+        b = old.get((r['case'], r['size']))
+        if b is None:
+            continue
+        for key in ('seconds', 'peak_bytes'):
+            if r[key] > b[key] * (1 + tolerance):
+                regressions.append(f"{r['case']}/{r['size']} {key}: {b[key]:.4g} -> {r[key]:.4g} "
+                                   f"({r[key] / b[key]:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', help='write the results as a JSON list to this file')
+    parser.add_argument('--compare', help='results file of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = []
+    for r in run(args.sizes, args.repeat):
+        print(json.dumps(r))
+        results.append(r)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'python': platform.python_version(), 'results': results}, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        for line in regressions:
+            print('regression:', line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
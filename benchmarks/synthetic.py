@@ -0,0 +1,153 @@
+"""Deterministic synthetic replays for the benchmarks, built from the bsor model classes.
+
+Run the benchmarks from the repository root with ``PYTHONPATH=src``.
+"""
+import random
+from io import BytesIO
+
+from bsor.Bsor import *
+
+
+def _vr_object(rnd: random.Random) -> VRObject:
+    v = VRObject()
+    v.x, v.y, v.z = rnd.uniform(-1, 1), rnd.uniform(0, 2), rnd.uniform(-1, 1)
+    v.x_rot, v.y_rot, v.z_rot, v.w_rot = (rnd.uniform(-1, 1) for _ in range(4))
+    return v
+
+
+def _info() -> Info:
+    info = Info()
+    info.version = '0.9.0'
+    info.gameVersion = '1.29.1'
+    info.timestamp = '1700000000'
+    info.playerId = '76561198026425351'
+    info.playerName = 'Schippi'
+    info.platform = 'steam'
+    info.trackingSystem = 'Oculus'
+    info.hmd = 'Rift_S'
+    info.controller = 'Touch'
+    info.songHash = '09FD6D30C55F6D721AB75A10FD412A1A1037F9A9'
+    info.songName = 'synthetic'
+    info.mapper = 'bench'
+    info.difficulty = 'ExpertPlus'
+    info.score = 0
+    info.mode = 'Standard'
+    info.environment = 'DefaultEnvironment'
+    info.modifiers = ''
+    info.jumpDistance = 18.0
+    info.leftHanded = False
+    info.height = 1.75
+    info.startTime = 0.0
+    info.failTime = 0.0
+    info.speed = 0.0
+    return info
+
+
+def _cut(rnd: random.Random, saber_type: int) -> Cut:
+    c = Cut()
+    c.speedOK = rnd.random() > 0.02
+    c.directionOk = rnd.random() > 0.02
+    c.saberTypeOk = True
+    c.wasCutTooSoon = False
+    c.saberSpeed = rnd.uniform(2, 10)
+    c.saberDirection = [rnd.uniform(-1, 1) for _ in range(3)]
+    c.saberType = saber_type
+    c.timeDeviation = rnd.uniform(-0.05, 0.05)
+    c.cutDeviation = rnd.uniform(-10, 10)
+    c.cutPoint = [rnd.uniform(-1, 1) for _ in range(3)]
+    c.cutNormal = [rnd.uniform(-1, 1) for _ in range(3)]
+    c.cutDistanceToCenter = rnd.uniform(0, 0.35)
+    c.cutAngle = rnd.uniform(60, 120)
+    c.beforeCutRating = rnd.uniform(0.5, 1.2)
+    c.afterCutRating = rnd.uniform(0.5, 1.2)
+    return c
+
+
+def _note(rnd: random.Random, time: float) -> Note:
+    n = Note()
+    scoring_type = rnd.choice([NOTE_SCORE_TYPE_NORMAL_2] * 8 + [NOTE_SCORE_TYPE_SLIDERHEAD,
+                                                                 NOTE_SCORE_TYPE_SLIDERTAIL,
+                                                                 NOTE_SCORE_TYPE_BURSTSLIDERHEAD,
+                                                                 NOTE_SCORE_TYPE_BURSTSLIDERELEMENT])
+    color = rnd.randint(0, 1)
+    n.note_id = scoring_type * 10000 + rnd.randint(0, 3) * 1000 + rnd.randint(0, 2) * 100 + color * 10 + rnd.randint(0, 8)
+    n.event_time = time
+    n.spawn_time = time - 0.1
+    n.event_type = rnd.choice([NOTE_EVENT_GOOD] * 30 + [NOTE_EVENT_BAD, NOTE_EVENT_MISS, NOTE_EVENT_BOMB])
+    n.cut = _cut(rnd, color) if n.event_type in [NOTE_EVENT_GOOD, NOTE_EVENT_BAD] else None
+    return n
+
+
+def _tricks(rnd: random.Random, segments: int, segment_frames: int, duration: float) -> TricksReplay:
+    ree = TricksReplay()
+    ree.magic = 1630166513
+    ree.version = 1
+    ree.left, ree.right = [], []
+    for hand in (ree.left, ree.right):
+        for i in range(segments):
+            s = Segment()
+            start = duration * i / segments
+            s.frames = []
+            for j in range(segment_frames):
+                rf = ReeFrame()
+                rf.song_time = start + j / 90
+                rf.position = _vr_object(rnd)
+                s.frames.append(rf)
+            hand.append(s)
+    return ree
+
+
+def synthetic_bsor(frames: int = 1000, notes: int = 200, walls: int = 10, user_data: int = 1,
+                   tricks_segments: int = 0, tricks_frames: int = 90, seed: int = 0) -> Bsor:
+    """A replay with the given record counts; the same arguments always give the same bytes.
+
+    user_data generic entries are written (at least one, see below) plus a ReeSabers tricks replay
+    with tricks_segments segments of tricks_frames frames per hand, if tricks_segments is set.
+    """
+    rnd = random.Random(seed)
+    m = Bsor()
+    m.magic_number = int(MAGIC_HEX, 16)
+    m.file_version = 1
+    m.info = _info()
+    m.frames = []
+    for i in range(frames):
+        fr = Frame()
+        fr.time = i / 90
+        fr.fps = 90
+        fr.head, fr.left_hand, fr.right_hand = _vr_object(rnd), _vr_object(rnd), _vr_object(rnd)
+        m.frames.append(fr)
+    duration = max(frames / 90, 1.0)
+    m.notes = [_note(rnd, duration * i / max(notes, 1)) for i in range(notes)]
+    m.walls = []
+    for i in range(walls):
+        w = Wall()
+        w.id = 1000 + i
+        w.energy = rnd.uniform(0, 1)
+        w.time = rnd.uniform(0, duration)
+        w.spawnTime = w.time - 0.5
+        m.walls.append(w)
+    h = Height()
+    h.height, h.time = 1.75, 0.0
+    m.heights = [h]
+    p = Pause()
+    p.duration, p.time = 1500, duration / 2
+    m.pauses = [p]
+    m.controller_offsets = ControllerOffsets()
+    m.controller_offsets.left = _vr_object(rnd)
+    m.controller_offsets.right = _vr_object(rnd)
+    # Bsor.write skips an empty user data section, which make_bsor can not read back
+    m.user_data = []
+    for i in range(max(user_data, 1)):
+        u = UserData()
+        u.key = 'synthetic' if i == 0 else f'synthetic-{i}'
+        u.bytes = bytes(rnd.getrandbits(8) for _ in range(16))
+        m.user_data.append(u)
+    if tricks_segments:
+        m.user_data.append(_tricks(rnd, tricks_segments, tricks_frames, duration))
+    return m
+
+
+def synthetic_bytes(**kwargs) -> bytes:
+    stream = BytesIO()
+    synthetic_bsor(**kwargs).write(stream)
+    return stream.getvalue()
@@ -1,7 +1,9 @@
 from .Decoder import *
 from .Encoder import *
+import struct
 from typing import BinaryIO
 from typing import List
+from typing import Iterator
 import logging
 from io import BytesIO
 from io import SEEK_END
@@ -39,6 +41,17 @@ SABER_RIGHT = 0
 MAX_SUPPORTED_VERSION = 1
 MAGIC_HEX = '0x442d3d69'
 
+# fixed-layout records, all little endian, ints unsigned like decode_int/decode_long
+VR_OBJECT_STRUCT = struct.Struct('<7f')
+FRAME_STRUCT = struct.Struct('<fI21f')
+NOTE_STRUCT = struct.Struct('<IffI')
+CUT_STRUCT = struct.Struct('<4B4fI12f')
+WALL_STRUCT = struct.Struct('<Ifff')
+HEIGHT_STRUCT = struct.Struct('<ff')
+PAUSE_STRUCT = struct.Struct('<Qf')
+REE_FRAME_STRUCT = struct.Struct('<8f')
+SECTION_HEADER_STRUCT = struct.Struct('<BI')
+
 lookup_dict_scoring_type = {
     NOTE_SCORE_TYPE_NORMAL_1: 'Normal',
     NOTE_SCORE_TYPE_IGNORE: 'Ignore',
@@ -62,6 +75,19 @@ def make_things(f, thing) -> List:
     cnt = decode_int(f)
     return [thing(f) for _ in range(cnt)]
 
+
+def iter_things(f, thing) -> Iterator:
+    cnt = decode_int(f)
+    for _ in range(cnt):
+        yield thing(f)
+
+
+def iter_section(f, magic: int, name: str, thing) -> Iterator:
+    section_magic = decode_byte(f)
+    if section_magic != magic:
+        raise BSException(f'{name} magic number must be {magic}, got "{section_magic}" instead')
+    yield from iter_things(f, thing)
+
 def write_things(f, data: list, data_types: list = None, magic: int = None):
     if magic is not None:
         encode_byte(f, magic)
@@ -98,16 +124,33 @@ def write_things(f, data: list, data_types: list = None, magic: int = None):
 
 
 
+def pack_section(magic: int, data: list, record_struct: struct.Struct, values) -> bytearray:
+    # whole fixed-size section (magic, count, records) in one buffer, values(d) gives the record fields
+    size = record_struct.size
+    buf = bytearray(SECTION_HEADER_STRUCT.size + len(data) * size)
+    SECTION_HEADER_STRUCT.pack_into(buf, 0, magic, len(data))
+    pack_into = record_struct.pack_into
+    offset = SECTION_HEADER_STRUCT.size
+    for d in data:
+        pack_into(buf, offset, *values(d))
+        offset += size
+    return buf
+
+
 class BSException(BaseException):
     pass
 
 
 class Writable(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def write(self, f: BinaryIO):
         pass
 
 class JSONable(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def json_dict(self):
         pass
@@ -194,6 +237,7 @@ def make_info(f) -> Info:
 
 
 class VRObject(JSONable, Writable):
+    __slots__ = ('x', 'y', 'z', 'x_rot', 'y_rot', 'z_rot', 'w_rot')
     x: float
     y: float
     z: float
@@ -213,25 +257,36 @@ class VRObject(JSONable, Writable):
     def write(self, f: BinaryIO):
         write_things(f, [self.x, self.y, self.z, self.x_rot, self.y_rot, self.z_rot, self.w_rot])
 
+    def __reduce__(self):
+        # pickles as a flat tuple, much smaller and faster than the generic slots state
+        return vr_object_from, (vr_object_values(self),)
+
     def json_dict(self):
         return {'position': {'x': self.x, 'y': self.y, 'z': self.z},
                 'rotation': {'x': self.x_rot, 'y': self.y_rot, 'z': self.z_rot, 'w': self.w_rot}
                 }
 
 
-def make_vr_object(f) -> VRObject:
+def vr_object_values(v: VRObject) -> tuple:
+    return v.x, v.y, v.z, v.x_rot, v.y_rot, v.z_rot, v.w_rot
+
+
+def vr_object_from(values) -> VRObject:
     v = VRObject()
-    v.x = decode_float(f)
-    v.y = decode_float(f)
-    v.z = decode_float(f)
-    v.x_rot = decode_float(f)
-    v.y_rot = decode_float(f)
-    v.z_rot = decode_float(f)
-    v.w_rot = decode_float(f)
+    v.x, v.y, v.z, v.x_rot, v.y_rot, v.z_rot, v.w_rot = values
     return v
 
 
+def unpack_vr_object(buf, offset: int = 0) -> VRObject:
+    return vr_object_from(VR_OBJECT_STRUCT.unpack_from(buf, offset))
+
+
+def make_vr_object(f) -> VRObject:
+    return unpack_vr_object(f.read(VR_OBJECT_STRUCT.size))
+
+
 class Frame(JSONable, Writable):
+    __slots__ = ('time', 'fps', 'head', 'left_hand', 'right_hand')
     time: float
     fps: int
     head: VRObject
@@ -241,40 +296,76 @@ class Frame(JSONable, Writable):
     def write(self, f: BinaryIO):
         write_things(f, [self.time, self.fps, self.head, self.left_hand, self.right_hand])
 
+    def __reduce__(self):
+        return frame_from, (frame_values(self),)
+
     def json_dict(self):
-        return self.__dict__
+        return {'time': self.time, 'fps': self.fps, 'head': self.head, 'left_hand': self.left_hand,
+                'right_hand': self.right_hand}
+
+
+FRAMES_OBJECTS = 'objects'
+FRAMES_NUMPY = 'numpy'
 
 
-def make_frames(f) -> List[Frame]:
+def make_frames(f, mode: str = FRAMES_OBJECTS) -> List[Frame]:
     frames_start = decode_byte(f)
     if frames_start != 1:
         raise BSException(f'Frames magic number must be 1, got "{frames_start}" instead')
+    if mode == FRAMES_NUMPY:
+        from .FrameTable import make_frame_table
+        return make_frame_table(f)
+    if mode != FRAMES_OBJECTS:
+        raise ValueError(f'frames must be "{FRAMES_OBJECTS}" or "{FRAMES_NUMPY}", got "{mode}"')
     result = make_things(f, make_frame)
     return result
 
 
-def make_frame(f) -> Frame:
+def iter_frames(f) -> Iterator[Frame]:
+    return iter_section(f, 1, 'Frames', make_frame)
+
+
+def frame_values(fr: Frame) -> tuple:
+    h, l, r = fr.head, fr.left_hand, fr.right_hand
+    return (fr.time, fr.fps,
+            h.x, h.y, h.z, h.x_rot, h.y_rot, h.z_rot, h.w_rot,
+            l.x, l.y, l.z, l.x_rot, l.y_rot, l.z_rot, l.w_rot,
+            r.x, r.y, r.z, r.x_rot, r.y_rot, r.z_rot, r.w_rot)
+
+
+def frame_from(values) -> Frame:
     fr = Frame()
-    fr.time = decode_float(f)
-    fr.fps = decode_int(f)
-    fr.head = make_vr_object(f)
-    fr.left_hand = make_vr_object(f)
-    fr.right_hand = make_vr_object(f)
+    fr.time = values[0]
+    fr.fps = values[1]
+    fr.head = vr_object_from(values[2:9])
+    fr.left_hand = vr_object_from(values[9:16])
+    fr.right_hand = vr_object_from(values[16:23])
     return fr
 
 
+def unpack_frame(buf, offset: int = 0) -> Frame:
+    return frame_from(FRAME_STRUCT.unpack_from(buf, offset))
+
+
+def make_frame(f) -> Frame:
+    return unpack_frame(f.read(FRAME_STRUCT.size))
+
+
 class Cut(JSONable, Writable):
+    __slots__ = ('speedOK', 'directionOk', 'saberTypeOk', 'wasCutTooSoon', 'saberSpeed', 'saberDirection',
+                 'saberType', 'timeDeviation', 'cutDeviation', 'cutPoint', 'cutNormal', 'cutDistanceToCenter',
+                 'cutAngle', 'beforeCutRating', 'afterCutRating')
     speedOK: bool
     directionOk: bool
     saberTypeOk: bool
     wasCutTooSoon: bool
     saberSpeed: float
-    saberDirection: typing.List
+    saberDirection: typing.Tuple[float, float, float]
     saberType: int
     timeDeviation: float
     cutDeviation: float
-    cutPoint: typing.List
-    cutNormal: typing.List
+    cutPoint: typing.Tuple[float, float, float]
+    cutNormal: typing.Tuple[float, float, float]
     cutDistanceToCenter: float
     cutAngle: float
     beforeCutRating: float
@@ -288,9 +379,12 @@ class Cut(JSONable, Writable):
                          self.cutNormal[0],self.cutNormal[1],self.cutNormal[2],
                          self.cutDistanceToCenter, self.cutAngle, self.beforeCutRating, self.afterCutRating])
 
+    def __reduce__(self):
+        return cut_from, (cut_values(self),)
+
 
     def json_dict(self):
-        print_dict = self.__dict__.copy()
+        print_dict = {name: getattr(self, name) for name in self.__slots__}
         print_dict['saberType'] = 'left' if self.saberType == SABER_LEFT else 'right'
         print_dict['saberDirection'] = {'x': self.saberDirection[0], 'y': self.saberDirection[1], 'z': self.saberDirection[2]}
         print_dict['cutPoint'] = {'x': self.cutPoint[0], 'y': self.cutPoint[1], 'z': self.cutPoint[2]}
@@ -309,6 +403,8 @@ class Note(JSONable, Writable):
     # SliderTail = 5,
     # BurstSliderHead = 6,
     # BurstSliderElement = 7
+    __slots__ = ('note_id', 'cutDirection', 'colorType', 'noteLineLayer', 'lineIndex', 'scoringType', 'event_time',
+                 'spawn_time', 'event_type', 'cut', 'pre_score', 'post_score', 'acc_score', 'score')
     note_id: int
     scoringType: int
     lineIndex: int
@@ -328,7 +424,7 @@ class Note(JSONable, Writable):
         write_things(f, [self.note_id, self.event_time, self.spawn_time, self.event_type, self.cut])
 
     def json_dict(self):
-        print_dict = self.__dict__.copy()
+        print_dict = {name: getattr(self, name) for name in self.__slots__}
         print_dict['scoringType'] = lookup_dict_scoring_type[self.scoringType]
         print_dict['event_type'] = lookup_dict_event_type[self.event_type]
         return print_dict
@@ -343,9 +439,13 @@ def make_notes(f) -> List[Note]:
     return result
 
 
-def make_note(f) -> Note:
+def iter_notes(f) -> Iterator[Note]:
+    return iter_section(f, 2, 'Notes', make_note)
+
+
+def note_from(note_id: int, event_time: float, spawn_time: float, event_type: int, cut: Cut) -> Note:
     n = Note()
-    n.note_id = decode_int(f)
+    n.note_id = note_id
     x = n.note_id
     n.cutDirection = int(x % 10)
     x = (x - n.cutDirection) / 10
@@ -357,11 +457,11 @@ def make_note(f) -> Note:
     x = (x - n.lineIndex) / 10
     n.scoringType = int(x % 10)
     x = (x - n.scoringType) / 10
-    n.event_time = decode_float(f)
-    n.spawn_time = decode_float(f)
-    n.event_type = decode_int(f)
-    if n.event_type in [NOTE_EVENT_GOOD, NOTE_EVENT_BAD]:
-        n.cut = make_cut(f)
+    n.event_time = event_time
+    n.spawn_time = spawn_time
+    n.event_type = event_type
+    if cut is not None:
+        n.cut = cut
         score = calc_note_score(n.cut, n.scoringType)
         n.pre_score = score[0]
         n.post_score = score[1]
@@ -375,6 +475,39 @@ def make_note(f) -> Note:
     return n
 
 
+def pack_notes(notes: List[Note]) -> bytearray:
+    # notes are the only variable-size records, a cut follows the note when it has one (like Note.write)
+    note_size, cut_size = NOTE_STRUCT.size, CUT_STRUCT.size
+    buf = bytearray(SECTION_HEADER_STRUCT.size + len(notes) * note_size
+                    + sum(cut_size for n in notes if n.cut is not None))
+    SECTION_HEADER_STRUCT.pack_into(buf, 0, 2, len(notes))
+    pack_note, pack_cut = NOTE_STRUCT.pack_into, CUT_STRUCT.pack_into
+    offset = SECTION_HEADER_STRUCT.size
+    for n in notes:
+        pack_note(buf, offset, n.note_id, n.event_time, n.spawn_time, n.event_type)
+        offset += note_size
+        if n.cut is not None:
+            pack_cut(buf, offset, *cut_values(n.cut))
+            offset += cut_size
+    return buf
+
+
+def has_cut(event_type: int) -> bool:
+    return event_type == NOTE_EVENT_GOOD or event_type == NOTE_EVENT_BAD
+
+
+def unpack_note(buf, offset: int = 0) -> Note:
+    note_id, event_time, spawn_time, event_type = NOTE_STRUCT.unpack_from(buf, offset)
+    cut = unpack_cut(buf, offset + NOTE_STRUCT.size) if has_cut(event_type) else None
+    return note_from(note_id, event_time, spawn_time, event_type, cut)
+
+
+def make_note(f) -> Note:
+    note_id, event_time, spawn_time, event_type = NOTE_STRUCT.unpack(f.read(NOTE_STRUCT.size))
+    cut = make_cut(f) if has_cut(event_type) else None
+    return note_from(note_id, event_time, spawn_time, event_type, cut)
+
+
 def clamp(n, smallest, largest):
     return sorted([smallest, n, largest])[1]
 
@@ -421,27 +554,42 @@ def calc_note_score(cut: Cut, type: int):
     return beforeCutRawScore, afterCutRawScore, cutDistanceRawScore
 
 
-def make_cut(f) -> Cut:
+def cut_values(c: Cut) -> tuple:
+    return (c.speedOK, c.directionOk, c.saberTypeOk, c.wasCutTooSoon, c.saberSpeed, *c.saberDirection,
+            c.saberType, c.timeDeviation, c.cutDeviation, *c.cutPoint, *c.cutNormal,
+            c.cutDistanceToCenter, c.cutAngle, c.beforeCutRating, c.afterCutRating)
+
+
+def cut_from(values) -> Cut:
     c = Cut()
-    c.speedOK = decode_bool(f)
-    c.directionOk = decode_bool(f)
-    c.saberTypeOk = decode_bool(f)
-    c.wasCutTooSoon = decode_bool(f)
-    c.saberSpeed = decode_float(f)
-    c.saberDirection = [decode_float(f) for _ in range(3)]
-    c.saberType = decode_int(f)
-    c.timeDeviation = decode_float(f)
-    c.cutDeviation = decode_float(f)
-    c.cutPoint = [decode_float(f) for _ in range(3)]
-    c.cutNormal = [decode_float(f) for _ in range(3)]
-    c.cutDistanceToCenter = decode_float(f)
-    c.cutAngle = decode_float(f)
-    c.beforeCutRating = decode_float(f)
-    c.afterCutRating = decode_float(f)
+    c.speedOK = values[0] == 1
+    c.directionOk = values[1] == 1
+    c.saberTypeOk = values[2] == 1
+    c.wasCutTooSoon = values[3] == 1
+    c.saberSpeed = values[4]
+    c.saberDirection = values[5:8]
+    c.saberType = values[8]
+    c.timeDeviation = values[9]
+    c.cutDeviation = values[10]
+    c.cutPoint = values[11:14]
+    c.cutNormal = values[14:17]
+    c.cutDistanceToCenter = values[17]
+    c.cutAngle = values[18]
+    c.beforeCutRating = values[19]
+    c.afterCutRating = values[20]
     return c
 
 
+def unpack_cut(buf, offset: int = 0) -> Cut:
+    return cut_from(CUT_STRUCT.unpack_from(buf, offset))
+
+
+def make_cut(f) -> Cut:
+    return unpack_cut(f.read(CUT_STRUCT.size))
+
+
 class Wall(JSONable, Writable):
+    __slots__ = ('id', 'energy', 'time', 'spawnTime')
     id: int
     energy: float
     time: float
@@ -450,8 +598,11 @@ class Wall(JSONable, Writable):
     def write(self, f: BinaryIO):
         write_things(f, [self.id, self.energy, self.time, self.spawnTime])
 
+    def __reduce__(self):
+        return wall_from, (wall_values(self),)
+
     def json_dict(self):
-        return self.__dict__
+        return {'id': self.id, 'energy': self.energy, 'time': self.time, 'spawnTime': self.spawnTime}
 
 
 def make_walls(f) -> List[Wall]:
@@ -461,24 +612,41 @@ def make_walls(f) -> List[Wall]:
     return make_things(f, make_wall)
 
 
-def make_wall(f) -> Wall:
+def iter_walls(f) -> Iterator[Wall]:
+    return iter_section(f, 3, 'Wall', make_wall)
+
+
+def wall_values(w: Wall) -> tuple:
+    return w.id, w.energy, w.time, w.spawnTime
+
+
+def wall_from(values) -> Wall:
     w = Wall()
-    w.id = decode_int(f)
-    w.energy = decode_float(f)
-    w.time = decode_float(f)
-    w.spawnTime = decode_float(f)
+    w.id, w.energy, w.time, w.spawnTime = values
     return w
 
 
+def unpack_wall(buf, offset: int = 0) -> Wall:
+    return wall_from(WALL_STRUCT.unpack_from(buf, offset))
+
+
+def make_wall(f) -> Wall:
+    return unpack_wall(f.read(WALL_STRUCT.size))
+
+
 class Height(JSONable, Writable):
+    __slots__ = ('height', 'time')
     height: float
     time: float
 
     def write(self, f: BinaryIO):
         write_things(f, [self.height, self.time])
 
+    def __reduce__(self):
+        return height_from, (height_values(self),)
+
     def json_dict(self):
-        return self.__dict__
+        return {'height': self.height, 'time': self.time}
 
 
 def make_heights(f) -> List[Height]:
@@ -488,22 +656,37 @@ def make_heights(f) -> List[Height]:
     return make_things(f, make_height)
 
 
-def make_height(f) -> Height:
+def height_values(h: Height) -> tuple:
+    return h.height, h.time
+
+
+def height_from(values) -> Height:
     h = Height()
-    h.height = decode_float(f)
-    h.time = decode_float(f)
+    h.height, h.time = values
     return h
 
 
+def unpack_height(buf, offset: int = 0) -> Height:
+    return height_from(HEIGHT_STRUCT.unpack_from(buf, offset))
+
+
+def make_height(f) -> Height:
+    return unpack_height(f.read(HEIGHT_STRUCT.size))
+
+
 class Pause(JSONable, Writable):
+    __slots__ = ('duration', 'time')
     duration: int
     time: float
 
     def write(self, f: BinaryIO):
         write_things(f, [self.duration, self.time], ['long', float])
 
+    def __reduce__(self):
+        return pause_from, (pause_values(self),)
+
     def json_dict(self):
-        return self.__dict__
+        return {'duration': self.duration, 'time': self.time}
 
 
 def make_pauses(f) -> List[Pause]:
@@ -513,13 +696,24 @@ def make_pauses(f) -> List[Pause]:
     return make_things(f, make_pause)
 
 
-def make_pause(f) -> Pause:
+def pause_values(p: Pause) -> tuple:
+    return p.duration, p.time
+
+
+def pause_from(values) -> Pause:
     p = Pause()
-    p.duration = decode_long(f)
-    p.time = decode_float(f)
+    p.duration, p.time = values
     return p
 
 
+def unpack_pause(buf, offset: int = 0) -> Pause:
+    return pause_from(PAUSE_STRUCT.unpack_from(buf, offset))
+
+
+def make_pause(f) -> Pause:
+    return unpack_pause(f.read(PAUSE_STRUCT.size))
+
+
 class ControllerOffsets(JSONable, Writable):
     left: VRObject
     right: VRObject
@@ -554,21 +748,38 @@ class UserData(JSONable, Writable):
         return self.__dict__
 
 class ReeFrame (JSONable, Writable):
+    __slots__ = ('song_time', 'position')
     song_time: float
     position: VRObject
 
     def json_dict(self):
-        return self.__dict__
+        return {'song_time': self.song_time, 'position': self.position}
 
     def write(self, f: BinaryIO):
         encode_float(f, self.song_time)
         self.position.write(f)
 
-def make_ree_frame(f) -> ReeFrame:
+    def __reduce__(self):
+        return ree_frame_from, (ree_frame_values(self),)
+
+def ree_frame_values(rf: ReeFrame) -> tuple:
+    return (rf.song_time, *vr_object_values(rf.position))
+
+
+def ree_frame_from(values) -> ReeFrame:
     rf = ReeFrame()
-    rf.song_time = decode_float(f)
-    rf.position = make_vr_object(f)
+    rf.song_time = values[0]
+    rf.position = vr_object_from(values[1:8])
     return rf
+
+
+def unpack_ree_frame(buf, offset: int = 0) -> ReeFrame:
+    return ree_frame_from(REE_FRAME_STRUCT.unpack_from(buf, offset))
+
+
+def make_ree_frame(f) -> ReeFrame:
+    return unpack_ree_frame(f.read(REE_FRAME_STRUCT.size))
+
 class Segment (JSONable, Writable):
     frames: List[ReeFrame]
 
@@ -577,11 +788,22 @@ class Segment (JSONable, Writable):
 
     def write(self, f: BinaryIO):
         encode_int(f, len(self.frames))
-        write_things(f, self.frames)
+        if isinstance(self.frames, Writable):
+            # columnar frames (ReeFrameTable) write all records at once
+            self.frames.write(f)
+        else:
+            pack = REE_FRAME_STRUCT.pack
+            f.write(b''.join([pack(*ree_frame_values(rf)) for rf in self.frames]))
 
-def make_segment(f : BinaryIO ) -> Segment:
+def make_segment(f : BinaryIO, mode: str = FRAMES_OBJECTS) -> Segment:
+    # all frames of the segment are read at once, in numpy mode they stay a ReeFrameTable over that buffer
     segment = Segment()
-    segment.frames = make_things(f, make_ree_frame)
+    if mode == FRAMES_NUMPY:
+        from .FrameTable import make_ree_frame_table
+        segment.frames = make_ree_frame_table(f)
+        return segment
+    cnt = decode_int(f)
+    segment.frames = [ree_frame_from(values) for values in REE_FRAME_STRUCT.iter_unpack(f.read(cnt * REE_FRAME_STRUCT.size))]
     return segment
 
 class TricksReplay (JSONable, Writable):
@@ -609,14 +831,14 @@ class TricksReplay (JSONable, Writable):
 
 
 
-def make_user_datas(f) -> List[UserData]:
+def make_user_datas(f, mode: str = FRAMES_OBJECTS) -> List[UserData]:
     user_data_magic = decode_byte(f)
     if user_data_magic != 7:
         raise BSException(f'UserData magic number must be 7, got "{user_data_magic}" instead')
-    return make_things(f, make_user_data)
+    return make_things(f, lambda f: make_user_data(f, mode))
 
 
-def make_ree(f) -> TricksReplay:
+def make_ree(f, mode: str = FRAMES_OBJECTS) -> TricksReplay:
     ree = TricksReplay()
     merk = f.tell()
     ree.magic = decode_int(f)
@@ -625,21 +847,21 @@ def make_ree(f) -> TricksReplay:
     ree.version = decode_int(f)
     if ree.version != 1:
         logging.warning(f'TricksReplay version {ree.version} might be not supported, tested with version 1 only. ')
-    ree.left = make_things(f, make_segment)
-    ree.right = make_things(f, make_segment)
+    ree.left = make_things(f, lambda f: make_segment(f, mode))
+    ree.right = make_things(f, lambda f: make_segment(f, mode))
     f.seek(0, SEEK_END)
     size = f.tell() - merk
     return ree
 
-def make_user_data(f) -> UserData:
+def make_user_data(f, mode: str = FRAMES_OBJECTS) -> UserData:
     key = decode_string(f)
     u = UserData()
     u.key = key
     byte_count = decode_int(f)
-    u.bytes = f.read(byte_count)
+    u.bytes = bytes(f.read(byte_count))
     if u.key == 'reesabers:tricks-replay':
         try:
-            u = make_ree(BytesIO(u.bytes))
+            u = make_ree(BytesIO(u.bytes), mode)
         except Exception as e:
             logging.warning(f'Failed to parse TricksReplay: {e}')
             raise e
@@ -659,54 +881,93 @@ class Bsor(JSONable, Writable):
     user_data: List[UserData]
 
     def write(self, f: BinaryIO):
-        encode_int(f, self.magic_number)
-        encode_byte(f, self.file_version)
-        self.info.write(f)
-        write_things(f, self.frames, magic=1)
-        write_things(f, self.notes, magic=2)
-        write_things(f, self.walls, magic=3)
-        write_things(f, self.heights, magic=4)
-        write_things(f, self.pauses, magic=5)
-        if self.controller_offsets:
-            encode_byte(f, 6)
-            self.controller_offsets.write(f)
-        if self.user_data:
-            write_things(f, self.user_data, magic=7)
+        # every section is packed into one buffer and written with a single call
+        header = BytesIO()
+        encode_int(header, self.magic_number)
+        encode_byte(header, self.file_version)
+        self.info.write(header)
+        f.write(header.getvalue())
+        if isinstance(self.frames, Writable):
+            # columnar frames (FrameTable) write all records at once
+            f.write(SECTION_HEADER_STRUCT.pack(1, len(self.frames)))
+            self.frames.write(f)
+        else:
+            f.write(pack_section(1, self.frames, FRAME_STRUCT, frame_values))
+        f.write(pack_notes(self.notes))
+        f.write(pack_section(3, self.walls, WALL_STRUCT, wall_values))
+        f.write(pack_section(4, self.heights, HEIGHT_STRUCT, height_values))
+        f.write(pack_section(5, self.pauses, PAUSE_STRUCT, pause_values))
+        if self.controller_offsets or self.user_data:
+            tail = BytesIO()
+            if self.controller_offsets:
+                encode_byte(tail, 6)
+                self.controller_offsets.write(tail)
+            if self.user_data:
+                write_things(tail, self.user_data, magic=7)
+            f.write(tail.getvalue())
 
 
     def json_dict(self):
         return self.__dict__
 
 
-def make_bsor(f: typing.BinaryIO) -> Bsor:
-    m = Bsor()
-
-    m.magic_number = decode_int(f)
-    if hex(m.magic_number) != MAGIC_HEX:
-        raise BSException(f'File magic number must be {MAGIC_HEX}, got "{hex(m.magic_number)}" instead.')
-    m.file_version = decode_byte(f)
+def make_file_header(f) -> typing.Tuple[int, int]:
+    magic_number = decode_int(f)
+    if hex(magic_number) != MAGIC_HEX:
+        raise BSException(f'File magic number must be {MAGIC_HEX}, got "{hex(magic_number)}" instead.')
+    file_version = decode_byte(f)
 
-    if m.file_version > MAX_SUPPORTED_VERSION:
-        logging.warning(f'File is version {m.file_version} and might not be compatible or not use all features'
+    if file_version > MAX_SUPPORTED_VERSION:
+        logging.warning(f'File is version {file_version} and might not be compatible or not use all features'
                         f', highest supported version is {MAX_SUPPORTED_VERSION}')
+    return magic_number, file_version
 
-    m.info = make_info(f)
-    m.frames = make_frames(f)
-    m.notes = make_notes(f)
-    m.walls = make_walls(f)
-    m.heights = make_heights(f)
-    m.pauses = make_pauses(f)
+
+def has_more_sections(f) -> bool:
     try:
         v2 = f.peek(1)
     except:
         v2 = f.read(1)
         if len(v2) >0:
             f.seek(-1, 1)
-    if v2:
+    return len(v2) > 0
+
+
+def make_bsor(f: typing.BinaryIO, frames: str = FRAMES_OBJECTS) -> Bsor:
+    m = Bsor()
+
+    m.magic_number, m.file_version = make_file_header(f)
+
+    m.info = make_info(f)
+    m.frames = make_frames(f, frames)
+    m.notes = make_notes(f)
+    m.walls = make_walls(f)
+    m.heights = make_heights(f)
+    m.pauses = make_pauses(f)
+    if has_more_sections(f):
         m.controller_offsets = make_controller_offsets(f)
-        m.user_data = make_user_datas(f)
+        m.user_data = make_user_datas(f, frames)
     else:
         m.controller_offsets = []
         m.user_data = []
     return m
 
+
+def stream_bsor(f: typing.BinaryIO) -> Iterator[typing.Tuple[str, typing.Any]]:
+    """Yields (section, record) in file order without keeping records around.
+
+    Sections are 'info', 'frames', 'notes', 'walls', 'heights', 'pauses', 'controller_offsets' and 'user_data'.
+    """
+    make_file_header(f)
+    yield 'info', make_info(f)
+    for name, records in [('frames', iter_frames(f)),
+                          ('notes', iter_notes(f)),
+                          ('walls', iter_walls(f)),
+                          ('heights', iter_section(f, 4, 'Height', make_height)),
+                          ('pauses', iter_section(f, 5, 'Pause', make_pause))]:
+        for record in records:
+            yield name, record
+    if has_more_sections(f):
+        yield 'controller_offsets', make_controller_offsets(f)
+        for record in iter_section(f, 7, 'UserData', make_user_data):
+            yield 'user_data', record
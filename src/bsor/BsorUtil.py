@@ -1,11 +1,23 @@
 from .Decoder import *
 from .Bsor import *
+from .Reader import open_bsor
 import json
 import requests
 import io
+import os
+import hashlib
+import tempfile
+import threading
+import time
 import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional
 
 logger = logging.getLogger(__name__)
+
+API_URL = 'https://api.beatleader.xyz'
+
 def download_Bsor(id: int) -> Bsor:
     # Download the file from the server
     with requests.get(f'https://api.beatleader.xyz/score/{id}') as r:
@@ -16,6 +28,186 @@ def download_Bsor(id: int) -> Bsor:
         replay.raise_for_status()
         return make_bsor(io.BufferedReader(io.BytesIO(replay.content)))
 
+
+class ReplayCache:
+    """Content addressed replay files on disk, bounded to max_bytes by evicting the least recently used.
+
+    blobs/<sha256>.bsor holds the replay, ids/<score id> the sha256 of the replay of that score.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 1 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, 'blobs'), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, 'ids'), exist_ok=True)
+        self._size = sum(e.stat().st_size for e in os.scandir(os.path.join(cache_dir, 'blobs')) if e.is_file())
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, 'blobs', f'{digest}.bsor')
+
+    def _id_path(self, id: int) -> str:
+        return os.path.join(self.cache_dir, 'ids', str(id))
+
+    def get(self, id: int) -> Optional[str]:
+        try:
+            with open(self._id_path(id)) as f:
+                path = self._blob_path(f.read().strip())
+            os.utime(path)  # mark as recently used
+            return path
+        except FileNotFoundError:
+            return None
+
+    def put(self, id: int, chunks: Iterable[bytes]) -> str:
+        """Streams chunks into the cache and returns the path of the stored replay."""
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            path = self._blob_path(digest.hexdigest())
+            size = os.path.getsize(tmp)
+            with self._lock:
+                if os.path.exists(path):
+                    os.remove(tmp)
+                else:
+                    os.replace(tmp, path)
+                    self._size += size
+                with open(self._id_path(id), 'w') as f:
+                    f.write(digest.hexdigest())
+                self._evict(keep=path)
+            return path
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _evict(self, keep: str):
+        if self._size <= self.max_bytes:
+            return
+        blobs = sorted((e.stat().st_mtime, e.path, e.stat().st_size)
+                       for e in os.scandir(os.path.join(self.cache_dir, 'blobs')) if e.is_file())
+        for _, path, size in blobs:
+            if self._size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            self._size -= size
+            logger.info(f'evicted {path} from replay cache')
+
+
+class DownloadResult:
+    id: int
+    bsor: Optional[Bsor]
+    path: Optional[str]  # cached replay file, None without cache
+    cached: bool  # served from the cache without network access
+    error: Optional[Exception]
+
+    def __init__(self, id: int, bsor: Optional[Bsor] = None, path: Optional[str] = None, cached: bool = False,
+                 error: Optional[Exception] = None):
+        self.id = id
+        self.bsor = bsor
+        self.path = path
+        self.cached = cached
+        self.error = error
+
+
+def _pooled_session(concurrency: int) -> requests.Session:
+    # one connection pool per host, big enough that no worker thread waits for a connection
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def download_many(ids: Iterable[int], concurrency: int = 8, cache_dir: str = None, max_cache_bytes: int = 1 << 30,
+                  session: requests.Session = None, api_url: str = API_URL) -> List[DownloadResult]:
+    """Downloads and parses the replays of many scores, results are in the order of ids.
+
+    All requests share one pooled session. With cache_dir, replays are streamed to a ReplayCache and
+    cached scores do not touch the network at all. A failed score has error set on its result.
+    """
+    cache = ReplayCache(cache_dir, max_cache_bytes) if cache_dir else None
+    own_session = session is None
+    if own_session:
+        session = _pooled_session(concurrency)
+
+    def download(id: int) -> DownloadResult:
+        try:
+            if cache is not None:
+                path = cache.get(id)
+                if path is not None:
+                    return DownloadResult(id, open_bsor(path), path, cached=True)
+            with session.get(f'{api_url}/score/{id}') as r:
+                r.raise_for_status()
+                replay_location = json.loads(r.content)['replay']
+            with session.get(replay_location, stream=True) as replay:
+                replay.raise_for_status()
+                chunks = replay.iter_content(chunk_size=1 << 16)
+                if cache is None:
+                    return DownloadResult(id, make_bsor(io.BytesIO(b''.join(chunks))))
+                path = cache.put(id, chunks)
+            return DownloadResult(id, open_bsor(path), path)
+        except (Exception, BSException) as e:
+            logger.warning(f'download of score {id} failed: {e}')
+            return DownloadResult(id, error=e)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(download, ids))
+    finally:
+        if own_session:
+            session.close()
+
+class TTLCache:
+    """Thread safe dict whose entries expire ttl seconds after they were put.
+
+    Expired entries are dropped on every put and at most max_size entries are kept (the oldest go first),
+    so a long running process does not keep every key it ever saw.
+    """
+
+    def __init__(self, ttl: float = 600, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # in insertion order, which is also expiry order
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return default
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            now = time.monotonic()
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while self._entries:
+                oldest = next(iter(self._entries))
+                if self._entries[oldest][0] >= now and len(self._entries) <= self.max_size:
+                    break
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# scorevalue and clan icon responses, shared by clan_playlist calls
+response_cache = TTLCache()
+
 """
     Get the playlist for a clan
     :param clan: the clan tag
@@ -25,10 +217,14 @@ def download_Bsor(id: int) -> Bsor:
     :param stars_from: the minimum stars for the songs, optional
     :param stars_to: the maximum stars for the songs, optional
     :param include_to_hold: include the to hold maps, if False only toConquer maps will be included
+    :param concurrency: how many map pages and player score checks run at the same time
+    :param session: requests session to use, a pooled one is created if None
+    :param api_url: BeatLeader API base url
 """
 def clan_playlist(clan: str, count: int = 20, imageb64: str = None, unplayed_player: int = None,
                   stars_from: int = None, stars_to: int = None, include_to_hold: bool = False,
-                  author: str = 'Schippi') -> dict:
+                  author: str = 'Schippi', concurrency: int = 8, session: requests.Session = None,
+                  api_url: str = API_URL) -> dict:
     clan = clan[:5]
     playlist = {
         'playlistTitle': f'contested maps for {clan}',
@@ -36,6 +232,9 @@ def clan_playlist(clan: str, count: int = 20, imageb64: str = None, unplayed_pla
         'songs': [],
         'image': imageb64
     }
+    own_session = session is None
+    if own_session:
+        session = _pooled_session(concurrency)
 
     def song_from_data(d):
         return {
@@ -51,65 +250,91 @@ def clan_playlist(clan: str, count: int = 20, imageb64: str = None, unplayed_pla
             ]
         }
 
-    def check_song(d):
-        if len(playlist['songs']) >= count:
-            return False
+    def check_stars(d):
         if stars_from and d['leaderboard']['difficulty']['stars'] < stars_from:
             return False
         if stars_to and d['leaderboard']['difficulty']['stars'] > stars_to:
             return False
-        if unplayed_player:
-            p_s = f'https://api.beatleader.xyz/player/{unplayed_player}/scorevalue/{d["leaderboard"]["song"]["hash"]}/{d["leaderboard"]["difficulty"]["difficultyName"]}/{d["leaderboard"]["difficulty"]["modeName"]}'
-            logger.info(p_s)
-            with requests.get(p_s) as pr:
-                if pr.status_code == 200:
-                    if int(pr.content) > 0:
-                        return False
         return True
 
+    def check_unplayed(d):
+        if not unplayed_player:
+            return True
+        p_s = f'{api_url}/player/{unplayed_player}/scorevalue/{d["leaderboard"]["song"]["hash"]}/{d["leaderboard"]["difficulty"]["difficultyName"]}/{d["leaderboard"]["difficulty"]["modeName"]}'
+        score = response_cache.get(p_s)
+        if score is None:
+            logger.info(p_s)
+            with session.get(p_s) as pr:
+                if pr.status_code != 200:
+                    return True
+                score = int(pr.content)
+            response_cache.put(p_s, score)
+        return score <= 0
+
     def get_image(parsed_response):
         if imageb64:
             return imageb64
+        if not parsed_response['data']:
+            return playlist['image']
         img_url = parsed_response['data'][0]['clan']['icon']
+        cached = response_cache.get(img_url)
+        if cached is not None:
+            return cached
         try:
-            with requests.get(img_url) as img:
+            with session.get(img_url) as img:
                 img.raise_for_status()
                 import base64
                 content = io.BytesIO(img.content)
-                return base64.b64encode(content.read()).decode('utf-8')
+                encoded = base64.b64encode(content.read()).decode('utf-8')
+            response_cache.put(img_url, encoded)
+            return encoded
         except:
             return ''
 
-
-
-    # Get the playlist from the server
-    divisor = 2 if include_to_hold else 1
-    page = 1
-    while len(playlist['songs']) < count:
-        s = f'https://api.beatleader.xyz/clan/{clan}/maps?page={page}&count={count//divisor}&sortBy=toconquer&order=0'
+    def get_page(sort_by, page):
+        s = f'{api_url}/clan/{clan}/maps?page={page}&count={count//divisor}&sortBy={sort_by}&order=0'
         logger.info(s)
-        with requests.get(s) as r:
+        with session.get(s) as r:
             r.raise_for_status()
             # Parse the JSON response
-            parsed = json.loads(r.content)
-            playlist['image'] = get_image(parsed)
+            return json.loads(r.content)
+
+    def fetch_pages(page):
+        sorts = ['toconquer', 'tohold'] if include_to_hold else ['toconquer']
+        return [executor.submit(get_page, sort_by, page) for sort_by in sorts]
 
-            for d in parsed['data']:
-                if check_song(d):
+    def add_songs(data):
+        # player checks run concurrently in batches, songs are still added in page order
+        candidates = [d for d in data if check_stars(d)]
+        for i in range(0, len(candidates), concurrency):
+            if len(playlist['songs']) >= count:
+                return
+            batch = candidates[i:i + concurrency]
+            for d, unplayed in zip(batch, executor.map(check_unplayed, batch)):
+                if unplayed and len(playlist['songs']) < count:
                     playlist['songs'].append(song_from_data(d))
 
-        if include_to_hold:
-            s = f'https://api.beatleader.xyz/clan/{clan}/maps?page={page}&count={count//divisor}&sortBy=tohold&order=0'
-            logging.info(s)
-            with requests.get(s) as r:
-                r.raise_for_status()
-                # Parse the JSON response
-                parsed = json.loads(r.content)
-                for d in parsed['data']:
-                    if check_song(d):
-                        playlist['songs'].append(song_from_data(d))
-        logger.info(f'songs in playlist after page {page}: {len(playlist["songs"])}')
-        page += 1
+    # Get the playlist from the server
+    divisor = 2 if include_to_hold else 1
+    page = 1
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending = fetch_pages(page)
+            while len(playlist['songs']) < count:
+                responses = [p.result() for p in pending]
+                # prefetch the next page while this one is checked
+                pending = fetch_pages(page + 1)
+                playlist['image'] = get_image(responses[0])
+                for parsed in responses:
+                    add_songs(parsed['data'])
+                logger.info(f'songs in playlist after page {page}: {len(playlist["songs"])}')
+                if not any(parsed['data'] for parsed in responses):
+                    break
+                page += 1
+            for p in pending:
+                p.cancel()
+    finally:
+        if own_session:
+            session.close()
 
     return playlist
-    # and return the playlist
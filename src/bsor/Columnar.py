@@ -0,0 +1,281 @@
+from .Bsor import *
+from .FrameTable import FRAME_DTYPE, FrameTable
+import json
+import os
+import pickle
+import sys
+import numpy as np
+from io import BufferedReader
+from typing import Dict, Tuple
+
+# record layouts as in the file (see the *_STRUCT definitions), notes get the index of their cut (-1 for none)
+NOTE_DTYPE = np.dtype([('note_id', '<u4'),
+                       ('event_time', '<f4'),
+                       ('spawn_time', '<f4'),
+                       ('event_type', '<u4'),
+                       ('cut', '<i4')])
+CUT_DTYPE = np.dtype([('speedOK', 'u1'),
+                      ('directionOk', 'u1'),
+                      ('saberTypeOk', 'u1'),
+                      ('wasCutTooSoon', 'u1'),
+                      ('saberSpeed', '<f4'),
+                      ('saberDirection', '<f4', (3,)),
+                      ('saberType', '<u4'),
+                      ('timeDeviation', '<f4'),
+                      ('cutDeviation', '<f4'),
+                      ('cutPoint', '<f4', (3,)),
+                      ('cutNormal', '<f4', (3,)),
+                      ('cutDistanceToCenter', '<f4'),
+                      ('cutAngle', '<f4'),
+                      ('beforeCutRating', '<f4'),
+                      ('afterCutRating', '<f4')])
+NOTE_HEADER_DTYPE = np.dtype([('note_id', '<u4'), ('event_time', '<f4'), ('spawn_time', '<f4'), ('event_type', '<u4')])
+WALL_DTYPE = np.dtype([('id', '<u4'), ('energy', '<f4'), ('time', '<f4'), ('spawnTime', '<f4')])
+HEIGHT_DTYPE = np.dtype([('height', '<f4'), ('time', '<f4')])
+PAUSE_DTYPE = np.dtype([('duration', '<u8'), ('time', '<f4')])
+
+COLUMNS = {
+    'frames': FRAME_DTYPE,
+    'notes': NOTE_DTYPE,
+    'cuts': CUT_DTYPE,
+    'walls': WALL_DTYPE,
+    'heights': HEIGHT_DTYPE,
+    'pauses': PAUSE_DTYPE,
+}
+
+
+def _records(magic: int, data: list, record_struct, values, dtype: np.dtype) -> np.ndarray:
+    return np.frombuffer(pack_section(magic, data, record_struct, values), dtype, offset=SECTION_HEADER_STRUCT.size)
+
+
+def _note_header(n: Note) -> tuple:
+    return n.note_id, n.event_time, n.spawn_time, n.event_type
+
+
+class ColumnarReplay:
+    """A replay as flat record arrays (frames, notes, cuts, walls, heights, pauses) plus the small
+    object parts (Info, controller offsets, user data) that are kept as they are.
+
+    The arrays can be moved to shared memory with to_shared_memory and attached in another process
+    without copying.
+    """
+    magic_number: int
+    file_version: int
+    info: Info
+    controller_offsets: ControllerOffsets
+    user_data: List[UserData]
+    frames: np.ndarray
+    notes: np.ndarray
+    cuts: np.ndarray
+    walls: np.ndarray
+    heights: np.ndarray
+    pauses: np.ndarray
+
+    def __init__(self, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.magic_number = meta['magic_number']
+        self.file_version = meta['file_version']
+        self.info = meta['info']
+        self.controller_offsets = meta['controller_offsets']
+        self.user_data = meta['user_data']
+        for name, dtype in COLUMNS.items():
+            setattr(self, name, arrays[name] if name in arrays else np.zeros(0, dtype))
+        self._shm = None
+
+    def meta(self) -> Dict:
+        return {'magic_number': self.magic_number, 'file_version': self.file_version, 'info': self.info,
+                'controller_offsets': self.controller_offsets, 'user_data': self.user_data}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in COLUMNS}
+
+    @property
+    def frame_table(self) -> FrameTable:
+        return FrameTable(self.frames)
+
+    def to_bsor(self, frames: str = FRAMES_OBJECTS) -> Bsor:
+        m = Bsor()
+        m.magic_number = self.magic_number
+        m.file_version = self.file_version
+        m.info = self.info
+        if frames == FRAMES_NUMPY:
+            m.frames = FrameTable(self.frames.copy())
+        else:
+            m.frames = list(FrameTable(self.frames))
+        cuts = np.ascontiguousarray(self.cuts)
+        m.notes = []
+        for note_id, event_time, spawn_time, event_type, cut in self.notes.tolist():
+            c = unpack_cut(cuts, cut * CUT_STRUCT.size) if cut >= 0 else None
+            m.notes.append(note_from(note_id, event_time, spawn_time, event_type, c))
+        m.walls = [wall_from(v) for v in WALL_STRUCT.iter_unpack(np.ascontiguousarray(self.walls))]
+        m.heights = [height_from(v) for v in HEIGHT_STRUCT.iter_unpack(np.ascontiguousarray(self.heights))]
+        m.pauses = [pause_from(v) for v in PAUSE_STRUCT.iter_unpack(np.ascontiguousarray(self.pauses))]
+        m.controller_offsets = self.controller_offsets
+        m.user_data = self.user_data
+        return m
+
+    def to_shared_memory(self) -> 'SharedReplay':
+        """Copies the arrays into a new shared memory block, call unlink() on the result when done.
+
+        On POSIX the block lives until unlink(). On Windows a block is freed when its last handle closes, so the
+        creating handle is kept open in this process until unlink() is called here, and attaching only works
+        while this process is alive (see share_bsor).
+        """
+        layout = []
+        offset = 0
+        for name, array in self.arrays().items():
+            layout.append((name, offset, len(array)))
+            offset += -(-array.nbytes // 8) * 8
+        shm = _untracked_shared_memory(create=True, size=max(offset, 1))
+        try:
+            for (name, start, count), array in zip(layout, self.arrays().values()):
+                shm.buf[start:start + array.nbytes] = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        if os.name == 'posix':
+            shm.close()
+        else:
+            _creator_handles[shm.name] = shm
+        return SharedReplay(shm.name, layout, pickle.dumps(self.meta()))
+
+    def close(self):
+        """Releases an attached shared memory block, the arrays must not be used after this."""
+        if self._shm is not None:
+            for name, dtype in COLUMNS.items():
+                setattr(self, name, np.zeros(0, dtype))
+            self._shm.close()
+            self._shm = None
+
+
+# blocks created by this process outside POSIX, where closing the last handle frees the block
+_creator_handles = {}
+
+
+def _untracked_shared_memory(**kwargs):
+    # the resource tracker of the creating process would unlink the block when that process (e.g. a pool
+    # worker) exits, and attaching registers it again before 3.13; SharedReplay.unlink() is the owner instead
+    from multiprocessing import shared_memory
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(track=False, **kwargs)
+    shm = shared_memory.SharedMemory(**kwargs)
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class SharedReplay:
+    """Picklable handle of a ColumnarReplay in shared memory: block name, array layout and the pickled object parts."""
+    name: str
+    layout: List[Tuple[str, int, int]]  # column, byte offset, record count
+    meta: bytes
+
+    def __init__(self, name: str, layout: List[Tuple[str, int, int]], meta: bytes):
+        self.name = name
+        self.layout = layout
+        self.meta = meta
+
+    def attach(self) -> ColumnarReplay:
+        """Maps the block, the arrays of the result are views of the shared memory (no copy)."""
+        shm = _untracked_shared_memory(name=self.name)
+        arrays = {name: np.ndarray((count,), COLUMNS[name], buffer=shm.buf, offset=start)
+                  for name, start, count in self.layout}
+        replay = ColumnarReplay(pickle.loads(self.meta), arrays)
+        replay._shm = shm
+        return replay
+
+    def unlink(self):
+        if os.name != 'posix':
+            # the block goes away with its last handle, which is the one to_shared_memory kept
+            shm = _creator_handles.pop(self.name, None)
+            if shm is not None:
+                shm.close()
+            return
+        from multiprocessing import shared_memory
+        # tracked here, unlink() unregisters it again
+        shm = shared_memory.SharedMemory(name=self.name)
+        shm.close()
+        shm.unlink()
+
+
+def columnar_from_bsor(m: Bsor) -> ColumnarReplay:
+    if isinstance(m.frames, FrameTable):
+        frames = m.frames.records
+    else:
+        frames = _records(1, m.frames, FRAME_STRUCT, frame_values, FRAME_DTYPE)
+    cut_notes = [n for n in m.notes if n.cut is not None]
+    headers = _records(2, m.notes, NOTE_STRUCT, _note_header, NOTE_HEADER_DTYPE)
+    notes = np.zeros(len(m.notes), NOTE_DTYPE)
+    for name in NOTE_HEADER_DTYPE.names:
+        notes[name] = headers[name]
+    has_cut = np.array([n.cut is not None for n in m.notes], dtype=bool)
+    notes['cut'] = np.where(has_cut, np.cumsum(has_cut) - 1, -1)
+    arrays = {
+        'frames': frames,
+        'notes': notes,
+        'cuts': _records(0, [n.cut for n in cut_notes], CUT_STRUCT, cut_values, CUT_DTYPE),
+        'walls': _records(3, m.walls, WALL_STRUCT, wall_values, WALL_DTYPE),
+        'heights': _records(4, m.heights, HEIGHT_STRUCT, height_values, HEIGHT_DTYPE),
+        'pauses': _records(5, m.pauses, PAUSE_STRUCT, pause_values, PAUSE_DTYPE),
+    }
+    meta = {'magic_number': m.magic_number, 'file_version': m.file_version, 'info': m.info,
+            'controller_offsets': m.controller_offsets, 'user_data': m.user_data}
+    return ColumnarReplay(meta, arrays)
+
+
+def share_bsor(m: Bsor) -> SharedReplay:
+    """Bsor to shared memory in one step, usable as parse_many reducer so workers only send back the handle.
+
+    Only on POSIX: elsewhere the block would be freed when the worker exits, before the handle can be attached.
+    """
+    if os.name != 'posix':
+        raise RuntimeError('share_bsor needs POSIX shared memory, on Windows a block is freed when the process '
+                           'that created it exits; return the Bsor from the worker instead')
+    return columnar_from_bsor(m).to_shared_memory()
+
+
+# on-disk layout written by save_columnar: one .npy per column, Info and file header as JSON and the
+# controller offsets and user data sections as raw bytes, so the replay can be written back byte for byte
+HEADER_FILE = 'header.json'
+TAIL_FILE = 'tail.bin'
+
+
+def save_columnar(m: typing.Union[Bsor, ColumnarReplay], directory: typing.Union[str, os.PathLike]):
+    replay = m if isinstance(m, ColumnarReplay) else columnar_from_bsor(m)
+    os.makedirs(directory, exist_ok=True)
+    for name, array in replay.arrays().items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    tail = BytesIO()
+    if replay.controller_offsets:
+        encode_byte(tail, 6)
+        replay.controller_offsets.write(tail)
+    if replay.user_data:
+        write_things(tail, replay.user_data, magic=7)
+    with open(os.path.join(directory, TAIL_FILE), 'wb') as f:
+        f.write(tail.getvalue())
+    with open(os.path.join(directory, HEADER_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'magic_number': replay.magic_number, 'file_version': replay.file_version,
+                   'info': replay.info.json_dict()}, f)
+
+
+def load_columnar(directory: typing.Union[str, os.PathLike], mmap: bool = True) -> ColumnarReplay:
+    """Loads what save_columnar wrote, with mmap the arrays are read-only memory maps of the .npy files."""
+    with open(os.path.join(directory, HEADER_FILE), encoding='utf-8') as f:
+        header = json.load(f)
+    info = Info()
+    for key, value in header['info'].items():
+        setattr(info, key, value)
+    with open(os.path.join(directory, TAIL_FILE), 'rb') as f:
+        tail = BufferedReader(BytesIO(f.read()))
+    if has_more_sections(tail):
+        controller_offsets = make_controller_offsets(tail)
+        user_data = make_user_datas(tail)
+    else:
+        controller_offsets = []
+        user_data = []
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r' if mmap else None)
+              for name in COLUMNS}
+    meta = {'magic_number': header['magic_number'], 'file_version': header['file_version'], 'info': info,
+            'controller_offsets': controller_offsets, 'user_data': user_data}
+    return ColumnarReplay(meta, arrays)
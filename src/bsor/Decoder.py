@@ -21,24 +21,48 @@ def decode_string(fa: typing.BinaryIO) -> str:
     if length == 0:
         return ''
     result = fa.read(length)
-    result = result.decode("utf-8")
+    result = str(result, "utf-8")
     return result
 
 # thanks https://github.com/Metalit/Replay/commit/3d63185c7a5863c1e3964e8e228f2d9dd8769168
+# the length prefix of some names is too short, the string then runs on until the next plausible
+# length prefix (at most 100), which is searched in a read-ahead buffer instead of byte by byte
+STRING_LOOKAHEAD = 64
+
 def decode_string_maybe_utf16(fa: typing.BinaryIO) -> str:
     length = decode_int(fa)
     if length == 0:
         return ''
-    result = list(fa.read(length))
+    result = bytes(fa.read(length))
 
-    next_string_len= decode_int(fa)
-    while next_string_len < 0 or next_string_len > 100:
-        fa.seek(-4, 1)
-        result.append(decode_byte(fa))
-        next_string_len= decode_int(fa)
-    fa.seek(-4, 1)
+    ahead = b''
+    want = STRING_LOOKAHEAD
+    eof = False
+    k = 0
+    while True:
+        while len(ahead) < k + 4 and not eof:
+            chunk = fa.read(want)
+            eof = len(chunk) == 0
+            ahead += chunk
+            want *= 2
+        if len(ahead) < k + 4:
+            # fewer than 4 bytes left before the end of the stream
+            if int.from_bytes(ahead[k:k + 4], 'little') <= 100:
+                break
+            k += 1
+            continue
+        # a little endian value <= 100 has three zero bytes after its first byte
+        zeros = ahead.find(b'\x00\x00\x00', k + 1)
+        if zeros < 0:
+            k = len(ahead) - 3
+        elif ahead[zeros - 1] <= 100:
+            k = zeros - 1
+            break
+        else:
+            k = zeros
+    fa.seek(k - len(ahead), 1)
 
-    result = bytes(result).decode("utf-8")
+    result = (result + ahead[:k]).decode("utf-8")
     return result
 
 
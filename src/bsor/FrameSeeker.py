@@ -0,0 +1,90 @@
+from .Bsor import *
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional, Sequence
+
+
+class _FrameTimes(Sequence):
+    # frame times read from the file on access, enough for bisect
+    def __init__(self, seeker: 'FrameSeeker'):
+        self.seeker = seeker
+
+    def __len__(self):
+        return self.seeker.count
+
+    def __getitem__(self, i: int) -> float:
+        f = self.seeker.f
+        f.seek(self.seeker.record_offset(i))
+        return decode_float(f)
+
+
+class FrameSeeker:
+    """Random access to the frames of a replay by song time, without decoding the frames section.
+
+    Frames are fixed size records in increasing time order, so a time is found by binary search over the
+    records in the file, which takes O(log n) small reads. Only the file header and Info are decoded up front.
+    f has to be seekable and stay open. With frames='numpy' frames_between returns a FrameTable.
+    """
+    count: int
+    start: int  # offset of the first frame record
+
+    def __init__(self, f: typing.BinaryIO, frames: str = FRAMES_OBJECTS):
+        if frames not in (FRAMES_OBJECTS, FRAMES_NUMPY):
+            raise ValueError(f'frames must be "{FRAMES_OBJECTS}" or "{FRAMES_NUMPY}", got "{frames}"')
+        self.f = f
+        self.frames_mode = frames
+        self.magic_number, self.file_version = make_file_header(f)
+        self.info = make_info(f)
+        frames_start = decode_byte(f)
+        if frames_start != 1:
+            raise BSException(f'Frames magic number must be 1, got "{frames_start}" instead')
+        self.count = decode_int(f)
+        self.start = f.tell()
+        self.times = _FrameTimes(self)
+
+    def __len__(self):
+        return self.count
+
+    def record_offset(self, i: int) -> int:
+        if i < 0:
+            i = i + self.count
+        if not 0 <= i < self.count:
+            raise IndexError(f'frame {i} out of range, replay has {self.count} frames')
+        return self.start + i * FRAME_STRUCT.size
+
+    def frame(self, i: int) -> Frame:
+        self.f.seek(self.record_offset(i))
+        return unpack_frame(self.f.read(FRAME_STRUCT.size))
+
+    def index_at(self, time: float, lo: int = 0) -> int:
+        # last frame at or before time, the first frame for times before the replay starts
+        return max(bisect_right(self.times, time, lo) - 1, 0)
+
+    def frame_at(self, time: float) -> Optional[Frame]:
+        """The last frame at or before time (the first frame before the replay starts), None without frames."""
+        if self.count == 0:
+            return None
+        return self.frame(self.index_at(time))
+
+    def frames_between(self, t0: float, t1: float) -> List[Frame]:
+        """All frames with t0 <= time <= t1, read in one go."""
+        lo = bisect_left(self.times, t0)
+        hi = bisect_right(self.times, t1, lo)
+        self.f.seek(self.start + lo * FRAME_STRUCT.size)
+        block = self.f.read(max(hi - lo, 0) * FRAME_STRUCT.size)
+        if self.frames_mode == FRAMES_NUMPY:
+            from .FrameTable import FrameTable, FRAME_DTYPE
+            import numpy as np
+            return FrameTable(np.frombuffer(block, FRAME_DTYPE))
+        return [frame_from(values) for values in FRAME_STRUCT.iter_unpack(block)]
+
+    def sample(self, times: Iterable[float]) -> List[Optional[Frame]]:
+        """frame_at for each time; ascending times only search the frames after the previous hit."""
+        if self.count == 0:
+            return [None for _ in times]
+        result = []
+        previous_time, previous = None, 0
+        for t in times:
+            lo = previous if previous_time is not None and t >= previous_time else 0
+            previous_time, previous = t, self.index_at(t, lo)
+            result.append(self.frame(previous))
+        return result
@@ -0,0 +1,130 @@
+from .Bsor import *
+import numpy as np
+
+# one row per 92 byte frame record, same layout as FRAME_STRUCT
+FRAME_DTYPE = np.dtype([('time', '<f4'),
+                        ('fps', '<u4'),
+                        ('head', '<f4', (7,)),
+                        ('left_hand', '<f4', (7,)),
+                        ('right_hand', '<f4', (7,))])
+
+
+class FrameTable(JSONable, Writable):
+    """Columnar frames section, Frame objects are only built when indexed or iterated."""
+    records: np.ndarray
+
+    def __init__(self, records: np.ndarray):
+        self.records = np.ascontiguousarray(records, dtype=FRAME_DTYPE)
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.records['time']
+
+    @property
+    def fps(self) -> np.ndarray:
+        return self.records['fps']
+
+    @property
+    def head_position(self) -> np.ndarray:
+        return self.records['head'][:, :3]
+
+    @property
+    def head_rotation(self) -> np.ndarray:
+        return self.records['head'][:, 3:]
+
+    @property
+    def left_hand_position(self) -> np.ndarray:
+        return self.records['left_hand'][:, :3]
+
+    @property
+    def left_hand_rotation(self) -> np.ndarray:
+        return self.records['left_hand'][:, 3:]
+
+    @property
+    def right_hand_position(self) -> np.ndarray:
+        return self.records['right_hand'][:, :3]
+
+    @property
+    def right_hand_rotation(self) -> np.ndarray:
+        return self.records['right_hand'][:, 3:]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return FrameTable(self.records[i])
+        i = range(len(self.records))[i]
+        return unpack_frame(self.records, i * FRAME_STRUCT.size)
+
+    def __iter__(self):
+        return map(frame_from, FRAME_STRUCT.iter_unpack(self.records))
+
+    def write(self, f: BinaryIO):
+        f.write(self.records.tobytes())
+
+    def json_dict(self):
+        return [fr.json_dict() for fr in self]
+
+
+def frame_table_from(frames: List[Frame]) -> FrameTable:
+    stream = BytesIO()
+    for fr in frames:
+        fr.write(stream)
+    return FrameTable(np.frombuffer(stream.getvalue(), FRAME_DTYPE))
+
+
+def make_frame_table(f) -> FrameTable:
+    cnt = decode_int(f)
+    return FrameTable(np.frombuffer(f.read(cnt * FRAME_DTYPE.itemsize), FRAME_DTYPE, count=cnt))
+
+
+REE_FRAME_DTYPE = np.dtype([('song_time', '<f4'), ('position', '<f4', (7,))])
+
+
+class ReeFrameTable(JSONable, Writable):
+    """ReeSabers tricks frames of one Segment as a numpy record array, ReeFrame objects are built on access."""
+    records: np.ndarray
+
+    def __init__(self, records: np.ndarray):
+        self.records = np.ascontiguousarray(records, dtype=REE_FRAME_DTYPE)
+
+    @property
+    def song_time(self) -> np.ndarray:
+        return self.records['song_time']
+
+    @property
+    def position(self) -> np.ndarray:
+        return self.records['position'][:, 0:3]
+
+    @property
+    def rotation(self) -> np.ndarray:
+        return self.records['position'][:, 3:7]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return ReeFrameTable(self.records[i])
+        i = range(len(self.records))[i]
+        return unpack_ree_frame(self.records, i * REE_FRAME_STRUCT.size)
+
+    def __iter__(self):
+        return map(ree_frame_from, REE_FRAME_STRUCT.iter_unpack(self.records))
+
+    def write(self, f: BinaryIO):
+        f.write(self.records.tobytes())
+
+    def json_dict(self):
+        return [rf.json_dict() for rf in self]
+
+
+def ree_frame_table_from(frames: List[ReeFrame]) -> ReeFrameTable:
+    pack = REE_FRAME_STRUCT.pack
+    return ReeFrameTable(np.frombuffer(b''.join([pack(*ree_frame_values(rf)) for rf in frames]), REE_FRAME_DTYPE))
+
+
+def make_ree_frame_table(f) -> ReeFrameTable:
+    cnt = decode_int(f)
+    return ReeFrameTable(np.frombuffer(f.read(cnt * REE_FRAME_DTYPE.itemsize), REE_FRAME_DTYPE, count=cnt))
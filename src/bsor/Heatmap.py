@@ -0,0 +1,186 @@
+from .Bsor import *
+from .Columnar import ColumnarReplay
+from .Reader import open_bsor
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, Optional, Sequence, Tuple
+import numpy as np
+
+CELLS = 12  # lineIndex + 4 * noteLineLayer
+SABERS = 2
+DIRECTIONS = 9
+SCORE_BINS = {'pre': 71, 'post': 31, 'acc': 21}  # one bin per score value, acc goes up to 20 for burst elements
+
+
+class AccuracyHeatmap:
+    """Histograms of pre, post and acc scores and of timing deviation per grid cell, saber and cut direction,
+    summed over any number of replays.
+
+    Every histogram is a fixed size array indexed [cell, saber, direction, bin], so memory does not grow with
+    the number of replays. Good cuts go into the histograms, misses (by note color) and bad cuts (by saber)
+    are counted per cell. Notes outside the 4x3 grid (lineIndex > 3 or noteLineLayer > 2), with an unknown
+    cut direction or a saber other than 0 and 1 are only counted in skipped. Heatmaps with the same time bins
+    can be merged, e.g. partial results of workers.
+    """
+    time_range: Tuple[float, float]
+    time_bins: int
+    pre: np.ndarray
+    post: np.ndarray
+    acc: np.ndarray
+    time_deviation: np.ndarray  # timeDeviation of the cut, values outside time_range go to the edge bins
+    misses: np.ndarray
+    bad_cuts: np.ndarray
+    replays: int
+    skipped: int
+    failed: List[Tuple[str, str]]  # (path, error) of files aggregate_heatmap could not read
+
+    def __init__(self, time_range: Tuple[float, float] = (-0.1, 0.1), time_bins: int = 40):
+        self.time_range = (float(time_range[0]), float(time_range[1]))
+        self.time_bins = time_bins
+        shape = (CELLS, SABERS, DIRECTIONS)
+        self.pre = np.zeros(shape + (SCORE_BINS['pre'],), np.int64)
+        self.post = np.zeros(shape + (SCORE_BINS['post'],), np.int64)
+        self.acc = np.zeros(shape + (SCORE_BINS['acc'],), np.int64)
+        self.time_deviation = np.zeros(shape + (time_bins,), np.int64)
+        self.misses = np.zeros(shape, np.int64)
+        self.bad_cuts = np.zeros(shape, np.int64)
+        self.replays = 0
+        self.skipped = 0
+        self.failed = []
+
+    @property
+    def cuts(self) -> np.ndarray:
+        """Number of good cuts per [cell, saber, direction]."""
+        return self.pre.sum(axis=-1)
+
+    @property
+    def time_edges(self) -> np.ndarray:
+        return np.linspace(self.time_range[0], self.time_range[1], self.time_bins + 1)
+
+    def mean(self, kind: str) -> np.ndarray:
+        """Mean 'pre', 'post' or 'acc' score per [cell, saber, direction], nan where nothing was cut."""
+        hist = getattr(self, kind)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (hist * np.arange(SCORE_BINS[kind])).sum(axis=-1) / hist.sum(axis=-1)
+
+    def grid(self, kind: str, saber: Optional[int] = None) -> np.ndarray:
+        """Mean score per cell as the 3x4 grid of the map (row is noteLineLayer, bottom first), over all
+        cut directions and over both sabers unless saber is given."""
+        hist = getattr(self, kind).sum(axis=2)
+        hist = hist.sum(axis=1) if saber is None else hist[:, saber]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = (hist * np.arange(SCORE_BINS[kind])).sum(axis=-1) / hist.sum(axis=-1)
+        return means.reshape(3, 4)
+
+    def add_columns(self, note_id, event_type, saber, pre, post, acc, time_deviation):
+        """Adds the notes of one replay given as arrays. saber is the saber of the cut, or the note color
+        for notes without a cut; pre, post, acc and time_deviation are only used for good cuts."""
+        note_id = np.asarray(note_id, dtype=np.int64)
+        event_type = np.asarray(event_type)
+        saber = np.asarray(saber, dtype=np.int64)
+        direction = note_id % 10
+        line = note_id // 1000 % 10
+        layer = note_id // 100 % 10
+        known = (line < 4) & (layer < 3) & (direction < DIRECTIONS) & ((saber == 0) | (saber == 1))
+        slot = ((line + 4 * layer) * SABERS + saber) * DIRECTIONS + direction
+        slots = CELLS * SABERS * DIRECTIONS
+
+        # all increments are computed before any accumulator changes, so a failing replay adds nothing
+        good = known & (event_type == NOTE_EVENT_GOOD)
+        updates = []
+        for hist, values in ((self.pre, pre), (self.post, post), (self.acc, acc)):
+            bins = hist.shape[-1]
+            index = slot[good] * bins + np.clip(np.asarray(values, dtype=np.int64)[good], 0, bins - 1)
+            updates.append((hist, np.bincount(index, minlength=slots * bins).reshape(hist.shape)))
+        lo, hi = self.time_range
+        t = np.asarray(time_deviation, dtype=np.float64)[good]
+        time_bin = np.clip(np.floor((t - lo) / (hi - lo) * self.time_bins), 0, self.time_bins - 1).astype(np.int64)
+        updates.append((self.time_deviation, np.bincount(slot[good] * self.time_bins + time_bin,
+                                                         minlength=slots * self.time_bins)
+                        .reshape(self.time_deviation.shape)))
+        for counts, event in ((self.misses, NOTE_EVENT_MISS), (self.bad_cuts, NOTE_EVENT_BAD)):
+            updates.append((counts, np.bincount(slot[known & (event_type == event)], minlength=slots)
+                            .reshape(counts.shape)))
+        for accumulator, increment in updates:
+            accumulator += increment
+        self.skipped += int(np.count_nonzero(~known))
+        self.replays += 1
+
+    def add(self, m: Bsor):
+        """Adds the notes of a replay, only m.notes is used (so a LazyBsor decodes nothing else)."""
+        cnt = len(m.notes)
+        note_id = np.zeros(cnt, np.int64)
+        event_type, saber = np.zeros(cnt, np.int64), np.zeros(cnt, np.int64)
+        pre, post, acc = np.zeros(cnt, np.int64), np.zeros(cnt, np.int64), np.zeros(cnt, np.int64)
+        time_deviation = np.zeros(cnt)
+        for i, n in enumerate(m.notes):
+            note_id[i], event_type[i] = n.note_id, n.event_type
+            pre[i], post[i], acc[i] = n.pre_score, n.post_score, n.acc_score
+            if n.cut is None:
+                saber[i] = n.colorType
+            else:
+                saber[i], time_deviation[i] = n.cut.saberType, n.cut.timeDeviation
+        self.add_columns(note_id, event_type, saber, pre, post, acc, time_deviation)
+
+    def add_columnar(self, replay: ColumnarReplay):
+        """Adds a ColumnarReplay without building Note objects."""
+        from .VectorScoring import calc_note_scores
+        notes, cuts = replay.notes, replay.cuts
+        has_cut = notes['cut'] >= 0
+        cut = cuts[np.where(has_cut, notes['cut'], 0)] if len(cuts) else np.zeros(len(notes), cuts.dtype)
+        note_id = notes['note_id'].astype(np.int64)
+        valid = has_cut & (cut['directionOk'] != 0) & (cut['saberTypeOk'] != 0) & (cut['speedOK'] != 0)
+        pre, post, acc = calc_note_scores(cut['beforeCutRating'], cut['afterCutRating'], cut['cutDistanceToCenter'],
+                                          note_id // 10000 % 10, valid)
+        saber = np.where(has_cut, cut['saberType'], note_id // 10 % 10)
+        self.add_columns(note_id, notes['event_type'], saber, pre, post, acc, cut['timeDeviation'])
+
+    def merge(self, other: 'AccuracyHeatmap') -> 'AccuracyHeatmap':
+        """Adds the counts of other to this heatmap and returns it."""
+        if (other.time_range, other.time_bins) != (self.time_range, self.time_bins):
+            raise ValueError(f'can not merge heatmaps with time bins {other.time_range}/{other.time_bins} '
+                             f'into {self.time_range}/{self.time_bins}')
+        for name in ('pre', 'post', 'acc', 'time_deviation', 'misses', 'bad_cuts'):
+            getattr(self, name).__iadd__(getattr(other, name))
+        self.replays += other.replays
+        self.skipped += other.skipped
+        self.failed.extend(other.failed)
+        return self
+
+    __iadd__ = merge
+
+
+def _heatmap_of(paths: Sequence[str], time_range: Tuple[float, float], time_bins: int) -> AccuracyHeatmap:
+    heatmap = AccuracyHeatmap(time_range, time_bins)
+    for path in paths:
+        try:
+            heatmap.add(open_bsor(path, lazy=True))
+        except (Exception, BSException) as e:
+            heatmap.failed.append((path, ''.join(traceback.format_exception_only(type(e), e)).strip()))
+    return heatmap
+
+
+def aggregate_heatmap(paths: Iterable[typing.Union[str, os.PathLike]], workers: Optional[int] = None,
+                      chunksize: int = 64, time_range: Tuple[float, float] = (-0.1, 0.1),
+                      time_bins: int = 40) -> AccuracyHeatmap:
+    """AccuracyHeatmap of many bsor files, built in a process pool.
+
+    Each worker task reads chunksize files into its own heatmap and only that partial heatmap is sent back and
+    merged, so memory stays the same for any number of files. With workers=0 everything runs in this process.
+    """
+    paths = [os.fspath(p) for p in paths]
+    chunks = [paths[i:i + max(chunksize, 1)] for i in range(0, len(paths), max(chunksize, 1))]
+    partial_heatmap = partial(_heatmap_of, time_range=time_range, time_bins=time_bins)
+    result = AccuracyHeatmap(time_range, time_bins)
+    if workers == 0:
+        for chunk in chunks:
+            result.merge(partial_heatmap(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for part in executor.map(partial_heatmap, chunks):
+                result.merge(part)
+    if result.failed:
+        logging.warning(f'aggregate_heatmap: {len(result.failed)} of {len(paths)} files failed')
+    return result
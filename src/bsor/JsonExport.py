@@ -0,0 +1,102 @@
+from .Bsor import *
+import json
+from typing import Any, Iterable, Optional, Sequence, TextIO, Tuple
+
+# keys of Bsor.json_dict, in order
+SECTIONS = ['magic_number', 'file_version', 'info', 'frames', 'notes', 'walls', 'heights', 'pauses',
+            'controller_offsets', 'user_data']
+
+
+def _plain(o: Any, float_precision: Optional[int]) -> Any:
+    # json_dict all the way down, with floats rounded
+    if isinstance(o, JSONable):
+        o = o.json_dict()
+    if isinstance(o, float):
+        return round(o, float_precision)
+    if isinstance(o, dict):
+        return {k: _plain(v, float_precision) for k, v in o.items()}
+    if isinstance(o, (list, tuple)):
+        return [_plain(v, float_precision) for v in o]
+    return o
+
+
+class _RecordEncoder:
+    def __init__(self, float_precision: Optional[int]):
+        self.float_precision = float_precision
+        self.encoder = DefaultJsonEncoder()
+
+    def encode(self, o: Any) -> str:
+        if self.float_precision is not None:
+            o = _plain(o, self.float_precision)
+        return self.encoder.encode(o)
+
+    def write(self, fp: TextIO, value: Any):
+        # record lists and tables are written record by record, also inside records (TricksReplay segments)
+        if _is_records(value):
+            fp.write('[')
+            for i, record in enumerate(value):
+                if i:
+                    fp.write(', ')
+                self.write(fp, record)
+            fp.write(']')
+            return
+        if isinstance(value, JSONable):
+            value = value.json_dict()
+            if isinstance(value, dict) and any(_is_records(v) for v in value.values()):
+                fp.write('{')
+                for i, (key, v) in enumerate(value.items()):
+                    fp.write(f'{", " if i else ""}{json.dumps(key)}: ')
+                    self.write(fp, v)
+                fp.write('}')
+                return
+        fp.write(self.encode(value))
+
+
+def _is_records(value: Any) -> bool:
+    # lists of JSONables and iterable JSONables like FrameTable and ReeFrameTable
+    if isinstance(value, JSONable):
+        return hasattr(value, '__iter__')
+    return isinstance(value, list) and len(value) > 0 and isinstance(value[0], JSONable)
+
+
+def write_json(m: Bsor, fp: TextIO, sections: Sequence[str] = None, float_precision: int = None,
+               ndjson: bool = False):
+    """Writes m as JSON one record at a time, so the whole document is never held in memory.
+
+    Without sections and float_precision the output is the same as str(m). With a LazyBsor only the
+    requested sections are decoded. ndjson writes one {"section": ..., "record": ...} object per line instead.
+    """
+    sections = SECTIONS if sections is None else sections
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        raise ValueError(f'unknown sections {sorted(unknown)}, known sections are {SECTIONS}')
+    if ndjson:
+        write_ndjson(bsor_events(m, sections), fp, float_precision)
+        return
+    encoder = _RecordEncoder(float_precision)
+    fp.write('{')
+    for i, name in enumerate(sections):
+        value = getattr(m, name)
+        fp.write(f'{", " if i else ""}"{name}": ')
+        encoder.write(fp, value)
+    fp.write('}')
+
+
+def bsor_events(m: Bsor, sections: Sequence[str] = None) -> Iterable[Tuple[str, Any]]:
+    """(section, record) pairs of m, like stream_bsor yields them from a file."""
+    for name in SECTIONS if sections is None else sections:
+        value = getattr(m, name)
+        if _is_records(value):
+            for record in value:
+                yield name, record
+        else:
+            yield name, value
+
+
+def write_ndjson(events: Iterable[Tuple[str, Any]], fp: TextIO, float_precision: int = None):
+    """One JSON object per line for (section, record) events, e.g. from stream_bsor or bsor_events."""
+    encoder = _RecordEncoder(float_precision)
+    for name, record in events:
+        fp.write(f'{{"section": "{name}", "record": ')
+        encoder.write(fp, record)
+        fp.write('}\n')
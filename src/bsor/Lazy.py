@@ -0,0 +1,128 @@
+from .Bsor import *
+from typing import Dict, NamedTuple
+from io import SEEK_CUR
+
+
+class Section(NamedTuple):
+    magic: int
+    offset: int  # position of the magic byte
+    count: int
+    length: int  # bytes including magic byte and count
+
+
+SECTION_MAGIC = {
+    'frames': 1,
+    'notes': 2,
+    'walls': 3,
+    'heights': 4,
+    'pauses': 5,
+    'controller_offsets': 6,
+    'user_data': 7,
+}
+
+RECORD_SIZES = {
+    'frames': FRAME_STRUCT.size,
+    'walls': WALL_STRUCT.size,
+    'heights': HEIGHT_STRUCT.size,
+    'pauses': PAUSE_STRUCT.size,
+}
+
+
+def _section_start(f, name: str) -> int:
+    offset = f.tell()
+    magic = decode_byte(f)
+    if magic != SECTION_MAGIC[name]:
+        raise BSException(f'{name} magic number must be {SECTION_MAGIC[name]}, got "{magic}" instead')
+    return offset
+
+
+def _skip_notes(f, cnt: int):
+    for _ in range(cnt):
+        event_type = NOTE_STRUCT.unpack(f.read(NOTE_STRUCT.size))[3]
+        if has_cut(event_type):
+            f.seek(CUT_STRUCT.size, SEEK_CUR)
+
+
+def _skip_user_datas(f, cnt: int):
+    for _ in range(cnt):
+        f.seek(decode_int(f), SEEK_CUR)
+        f.seek(decode_int(f), SEEK_CUR)
+
+
+def index_sections(f) -> Dict[str, Section]:
+    """Records where each section starts and ends by skipping over it, f must be positioned right after Info."""
+    result = {}
+    for name in ['frames', 'notes', 'walls', 'heights', 'pauses', 'controller_offsets', 'user_data']:
+        if name == 'controller_offsets' and not has_more_sections(f):
+            break
+        offset = _section_start(f, name)
+        if name == 'controller_offsets':
+            cnt = 2
+            f.seek(2 * VR_OBJECT_STRUCT.size, SEEK_CUR)
+        else:
+            cnt = decode_int(f)
+            if name == 'notes':
+                _skip_notes(f, cnt)
+            elif name == 'user_data':
+                _skip_user_datas(f, cnt)
+            else:
+                f.seek(cnt * RECORD_SIZES[name], SEEK_CUR)
+        result[name] = Section(SECTION_MAGIC[name], offset, cnt, f.tell() - offset)
+    return result
+
+
+def _lazy_section(name: str, make):
+    def get(self):
+        if name not in self._decoded:
+            section = self.sections.get(name)
+            if section is None:
+                # same as make_bsor for files without the v2 sections
+                self._decoded[name] = []
+            else:
+                self._f.seek(section.offset)
+                self._decoded[name] = make(self)
+        return self._decoded[name]
+
+    def set(self, value):
+        self._decoded[name] = value
+
+    return property(get, set)
+
+
+class LazyBsor(Bsor):
+    """Bsor that decodes sections on first access and caches them.
+
+    Only the file header and Info are decoded up front, the other sections are located by skipping over them.
+    f has to stay open (and unchanged) while sections are still undecoded.
+    """
+    sections: Dict[str, Section]
+
+    def __init__(self, f: typing.BinaryIO, frames: str = FRAMES_OBJECTS):
+        self._f = f
+        self._frames_mode = frames
+        self._decoded = {}
+        self.magic_number, self.file_version = make_file_header(f)
+        self.info = make_info(f)
+        self.sections = index_sections(f)
+
+    frames = _lazy_section('frames', lambda self: make_frames(self._f, self._frames_mode))
+    notes = _lazy_section('notes', lambda self: make_notes(self._f))
+    walls = _lazy_section('walls', lambda self: make_walls(self._f))
+    heights = _lazy_section('heights', lambda self: make_heights(self._f))
+    pauses = _lazy_section('pauses', lambda self: make_pauses(self._f))
+    controller_offsets = _lazy_section('controller_offsets', lambda self: make_controller_offsets(self._f))
+    user_data = _lazy_section('user_data', lambda self: make_user_datas(self._f, self._frames_mode))
+
+    def json_dict(self):
+        return {
+            'magic_number': self.magic_number,
+            'file_version': self.file_version,
+            'info': self.info,
+            'frames': self.frames,
+            'notes': self.notes,
+            'walls': self.walls,
+            'heights': self.heights,
+            'pauses': self.pauses,
+            'controller_offsets': self.controller_offsets,
+            'user_data': self.user_data,
+        }
@@ -0,0 +1,123 @@
+from .Bsor import *
+from .Lazy import SECTION_MAGIC
+from .Reader import open_bsor, read_header
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+SECTIONS = ['info'] + list(SECTION_MAGIC)
+
+
+class ParseResult:
+    path: str
+    value: Any  # Bsor, or whatever the reducer returned
+    error: Optional[str]  # formatted exception if the file could not be parsed
+    size: int
+    seconds: float
+
+    def __init__(self, path: str, value: Any, error: Optional[str], size: int, seconds: float):
+        self.path = path
+        self.value = value
+        self.error = error
+        self.size = size
+        self.seconds = seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ParseReport:
+    results: List[ParseResult]
+    seconds: float  # wall clock time of the whole batch
+
+    def __init__(self, results: List[ParseResult], seconds: float):
+        self.results = results
+        self.seconds = seconds
+
+    @property
+    def errors(self) -> List[ParseResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def bytes(self) -> int:
+        return sum(r.size for r in self.results)
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.results) / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f'{len(self.results)} files ({len(self.errors)} failed), {self.bytes / 1e6:.1f} MB in '
+                f'{self.seconds:.2f} s: {self.files_per_second:.1f} files/s, {self.mb_per_second:.1f} MB/s')
+
+
+def _parse_sections(path: str, sections: Optional[Sequence[str]], frames: str, lazy: bool) -> Bsor:
+    if lazy:
+        return open_bsor(path, frames=frames, lazy=True)
+    if sections is None:
+        return open_bsor(path, frames=frames)
+    if set(sections) <= {'info'}:
+        header = read_header(path)
+        m = Bsor()
+        m.magic_number, m.file_version, m.info = header.magic_number, header.file_version, header.info
+        return m
+    # only the requested sections end up in the (pickled) result
+    source = open_bsor(path, frames=frames, lazy=True)
+    m = Bsor()
+    m.magic_number, m.file_version, m.info = source.magic_number, source.file_version, source.info
+    for name in sections:
+        if name != 'info':
+            setattr(m, name, getattr(source, name))
+    return m
+
+
+def _parse_one(path: str, sections: Optional[Sequence[str]], reducer: Optional[Callable[[Bsor], Any]],
+               frames: str, lazy: bool) -> ParseResult:
+    start = time.perf_counter()
+    size = 0
+    try:
+        size = os.path.getsize(path)
+        m = _parse_sections(path, sections, frames, lazy)
+        value = m if reducer is None else reducer(m)
+        return ParseResult(path, value, None, size, time.perf_counter() - start)
+    except (Exception, BSException) as e:
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        return ParseResult(path, None, error, size, time.perf_counter() - start)
+
+
+def parse_many(paths: Iterable[typing.Union[str, os.PathLike]], workers: Optional[int] = None,
+               sections: Optional[Sequence[str]] = None, reducer: Optional[Callable[[Bsor], Any]] = None,
+               chunksize: int = 16, frames: str = FRAMES_OBJECTS, lazy: bool = False) -> ParseReport:
+    """Parses many bsor files in a process pool, results are in the order of paths.
+
+    sections limits decoding to these sections (e.g. ['info', 'notes']), reducer is called with each Bsor in the
+    worker and only its return value is sent back, e.g. Scoring.calc_stats. reducer has to be picklable
+    (a module level function). With lazy the reducer gets a LazyBsor, which decodes only the sections the
+    reducer touches and knows all section counts. A file that fails to parse gives a ParseResult with error set
+    instead of stopping the batch. With workers=0 everything runs in this process.
+    """
+    paths = [os.fspath(p) for p in paths]
+    if lazy and reducer is None:
+        raise ValueError('lazy needs a reducer, a LazyBsor can not be sent back from a worker')
+    if sections is not None:
+        unknown = set(sections) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f'unknown sections {sorted(unknown)}, known sections are {SECTIONS}')
+    parse = partial(_parse_one, sections=sections, reducer=reducer, frames=frames, lazy=lazy)
+    start = time.perf_counter()
+    if workers == 0:
+        results = [parse(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse, paths, chunksize=max(chunksize, 1)))
+    report = ParseReport(results, time.perf_counter() - start)
+    logging.info(f'parse_many: {report}')
+    return report
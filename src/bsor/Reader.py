@@ -0,0 +1,287 @@
+from .Bsor import *
+from .Lazy import LazyBsor, Section, index_sections
+import bz2
+import gzip
+import lzma
+import os
+import tarfile
+import zipfile
+from io import SEEK_SET, SEEK_CUR, UnsupportedOperation
+from mmap import mmap as MemoryMap, ACCESS_READ
+
+
+class BufferReader:
+    """File-like reader over an in-memory buffer (bytes, bytearray, mmap).
+
+    read() returns memoryview slices of the buffer, so decoding does not copy bytes or touch the file.
+    """
+
+    def __init__(self, buf):
+        self.view = memoryview(buf).cast('B')
+        self.pos = 0
+
+    def read(self, size: int = -1) -> memoryview:
+        start = self.pos
+        end = len(self.view) if size is None or size < 0 else min(start + size, len(self.view))
+        self.pos = max(start, end)
+        return self.view[start:end]
+
+    def peek(self, size: int = 1) -> memoryview:
+        return self.view[self.pos:self.pos + max(size, 1)]
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            pos = offset
+        elif whence == SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == SEEK_END:
+            pos = len(self.view) + offset
+        else:
+            raise ValueError(f'invalid whence ({whence})')
+        if pos < 0:
+            raise ValueError(f'negative seek position {pos}')
+        self.pos = pos
+        return pos
+
+    def tell(self) -> int:
+        return self.pos
+
+    def release(self):
+        self.view.release()
+
+
+class StreamReader:
+    """File-like reader over a forward-only stream such as a decompressor.
+
+    Data is read from the stream in chunks and the last history bytes stay buffered, so peek and the short
+    backward seeks of the decoders (decode_string_maybe_utf16, has_more_sections) work without seeking the
+    stream. Forward seeks read and drop the bytes in between.
+    """
+
+    def __init__(self, raw: typing.BinaryIO, chunk_size: int = 1 << 16, history: int = 1 << 16):
+        self.raw = raw
+        self.chunk_size = chunk_size
+        self.history = history
+        self.buf = bytearray()
+        self.pos = 0  # position in buf
+        self.base = 0  # stream position of buf[0]
+        self.eof = False
+
+    def _fill(self, size: int):
+        # makes size bytes available after pos unless the stream ends first
+        if len(self.buf) - self.pos >= size or self.eof:
+            return
+        drop = self.pos - self.history
+        if drop > 0:
+            del self.buf[:drop]
+            self.pos -= drop
+            self.base += drop
+        while len(self.buf) - self.pos < size:
+            chunk = self.raw.read(max(size - (len(self.buf) - self.pos), self.chunk_size))
+            if not chunk:
+                self.eof = True
+                return
+            self.buf += chunk
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            rest = bytes(self.buf[self.pos:]) + self.raw.read()
+            self.base = self.tell() + len(rest)
+            self.buf, self.pos, self.eof = bytearray(), 0, True
+            return rest
+        end = self.pos + size
+        if end > len(self.buf):
+            self._fill(size)
+            end = self.pos + size
+        data = self.buf[self.pos:end]
+        self.pos += len(data)
+        return bytes(data)
+
+    def peek(self, size: int = 1) -> bytes:
+        self._fill(max(size, 1))
+        return bytes(self.buf[self.pos:self.pos + max(size, 1)])
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        if whence == SEEK_SET:
+            target = offset
+        elif whence == SEEK_CUR:
+            target = self.tell() + offset
+        else:
+            raise UnsupportedOperation('can not seek relative to the end of a stream')
+        if target < self.base:
+            raise UnsupportedOperation(f'can not seek back to {target}, only the last {self.history} bytes '
+                                       f'before {self.tell()} are kept')
+        while target > self.base + len(self.buf) and not self.eof:
+            self.pos = len(self.buf)
+            self._fill(min(target - self.base - len(self.buf), self.chunk_size))
+        self.pos = min(target - self.base, len(self.buf))
+        return self.tell()
+
+    def tell(self) -> int:
+        return self.base + self.pos
+
+    def close(self):
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+COMPRESSION_MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+    'zip': b'PK\x03\x04',
+}
+
+BSOR_SUFFIXES = ('.bsor', '.bsor.gz', '.bsor.bz2', '.bsor.xz')
+
+
+def detect_compression(head: bytes) -> typing.Optional[str]:
+    """'gzip', 'bz2', 'xz' or 'zip' by the magic bytes at the start of a file, None for anything else."""
+    for kind, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def _decompress(f: typing.BinaryIO, kind: str) -> typing.BinaryIO:
+    if kind == 'gzip':
+        return gzip.GzipFile(fileobj=f, mode='rb')
+    if kind == 'bz2':
+        return bz2.BZ2File(f)
+    if kind == 'xz':
+        return lzma.LZMAFile(f)
+    if kind == 'zip':
+        archive = zipfile.ZipFile(f)
+        names = [i.filename for i in archive.infolist() if i.filename.endswith(BSOR_SUFFIXES)]
+        if len(names) != 1:
+            raise ValueError(f'zip file has {len(names)} replays, open_bsor needs exactly one (see iter_archive)')
+        return _open_member(archive.open(names[0]))
+    raise ValueError(f'unknown compression {kind}')
+
+
+def _open_member(raw: typing.BinaryIO) -> typing.BinaryIO:
+    # archive members can be compressed on their own (e.g. .bsor.gz in a tar)
+    stream = StreamReader(raw)
+    kind = detect_compression(stream.peek(8))
+    if kind in ('gzip', 'bz2', 'xz'):
+        return _decompress(stream, kind)
+    return stream
+
+
+def _read_stream(stream: typing.BinaryIO, frames: str, lazy: bool) -> Bsor:
+    if lazy:
+        # sections are located by seeking, which needs the whole replay in memory
+        return LazyBsor(BufferReader(stream.read()), frames)
+    if not isinstance(stream, StreamReader):
+        stream = StreamReader(stream)
+    return make_bsor(stream, frames)
+
+
+def open_bsor(path: typing.Union[str, os.PathLike], mmap: bool = True, frames: str = FRAMES_OBJECTS,
+              lazy: bool = False) -> Bsor:
+    """Reads a bsor file from disk.
+
+    With mmap the file is mapped once and every section is decoded from the mapping. In frames='numpy' mode
+    the FrameTable is a view of the mapping (no copy), which then stays open as long as the table is alive.
+    With lazy a LazyBsor is returned, which keeps the mapping (or the file content) until it is collected.
+    gzip, bz2 and xz files and zip files with a single replay are detected by their magic bytes and decoded
+    straight from the decompressor (lazy decompresses into memory first).
+    """
+    with open(path, 'rb') as f:
+        kind = detect_compression(f.peek(8)[:8])
+        if kind is not None:
+            with _decompress(f, kind) as stream:
+                return _read_stream(stream, frames, lazy)
+        if not mmap or os.fstat(f.fileno()).st_size == 0:
+            if lazy:
+                return LazyBsor(BufferReader(f.read()), frames)
+            return make_bsor(f, frames)
+        mapped = MemoryMap(f.fileno(), 0, access=ACCESS_READ)
+    reader = BufferReader(mapped)
+    if lazy:
+        return LazyBsor(reader, frames)
+    m = make_bsor(reader, frames)
+    if frames != FRAMES_NUMPY:
+        reader.release()
+        mapped.close()
+    return m
+
+
+class BsorHeader(JSONable):
+    magic_number: int
+    file_version: int
+    info: Info
+    sections: typing.Optional[typing.Dict[str, Section]]
+
+    @property
+    def counts(self) -> typing.Optional[typing.Dict[str, int]]:
+        if self.sections is None:
+            return None
+        return {name: section.count for name, section in self.sections.items()}
+
+    def json_dict(self):
+        return {'magic_number': self.magic_number, 'file_version': self.file_version, 'info': self.info,
+                'counts': self.counts}
+
+
+def read_info(f: typing.BinaryIO) -> Info:
+    """Validates magic number and version and decodes Info, nothing after it is read."""
+    make_file_header(f)
+    return make_info(f)
+
+
+def make_header(f: typing.BinaryIO, counts: bool = False) -> BsorHeader:
+    h = BsorHeader()
+    h.magic_number, h.file_version = make_file_header(f)
+    h.info = make_info(f)
+    h.sections = index_sections(f) if counts else None
+    return h
+
+
+def read_header(path: typing.Union[str, os.PathLike], counts: bool = False) -> BsorHeader:
+    """Header and Info of a bsor file, with counts the section counts are added by seeking over the records."""
+    with open(path, 'rb') as f:
+        return make_header(f, counts)
+
+
+def iter_archive(path: typing.Union[str, os.PathLike], frames: str = FRAMES_OBJECTS, lazy: bool = False,
+                 skip_errors: bool = False) -> Iterator[typing.Tuple[str, Bsor]]:
+    """(member name, Bsor) for every replay (.bsor, .bsor.gz, .bsor.bz2, .bsor.xz) in a zip or tar file.
+
+    Members are decoded from the archive stream, nothing is extracted to disk. Compressed tar files are read
+    as a stream too. With skip_errors a member that fails to decode is logged and skipped.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith(BSOR_SUFFIXES):
+                    continue
+                with archive.open(info) as raw:
+                    m = _read_member(info.filename, raw, frames, lazy, skip_errors)
+                if m is not None:
+                    yield info.filename, m
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.endswith(BSOR_SUFFIXES):
+                    continue
+                m = _read_member(member.name, archive.extractfile(member), frames, lazy, skip_errors)
+                if m is not None:
+                    yield member.name, m
+    else:
+        raise ValueError(f'{path} is neither a zip nor a tar file')
+
+
+def _read_member(name: str, raw: typing.BinaryIO, frames: str, lazy: bool, skip_errors: bool) -> Bsor:
+    try:
+        return _read_stream(_open_member(raw), frames, lazy)
+    except (Exception, BSException) as e:
+        if not skip_errors:
+            raise
+        logging.warning(f'Skipping {name}: {e}')
+        return None
@@ -0,0 +1,158 @@
+from .Bsor import *
+from .Lazy import LazyBsor, SECTION_MAGIC
+from .Parallel import parse_many
+from .Reader import open_bsor
+from .Scoring import ScoreTracker
+import os
+import sqlite3
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+SQL_TYPES = {str: 'TEXT', int: 'INTEGER', bool: 'INTEGER', float: 'REAL'}
+
+INFO_COLUMNS = list(Info.__annotations__)
+COUNT_COLUMNS = [f'{name}_count' for name in SECTION_MAGIC if name != 'controller_offsets']
+STATS_COLUMNS = ['end_score', 'max_score', 'score_percent', 'left_misses', 'right_misses', 'left_bad_hits',
+                 'right_bad_hits', 'bomb_hits', 'wall_hits']
+COLUMNS = (['path', 'size', 'mtime_ns', 'error', 'file_version'] + INFO_COLUMNS + COUNT_COLUMNS
+           + STATS_COLUMNS)
+
+SCHEMA = f'''
+CREATE TABLE IF NOT EXISTS replays (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    error TEXT,
+    file_version INTEGER,
+    {', '.join(f'{name} {SQL_TYPES[t]}' for name, t in Info.__annotations__.items())},
+    {', '.join(f'{name} INTEGER' for name in COUNT_COLUMNS)},
+    {', '.join(f'{name} {"REAL" if name == "score_percent" else "INTEGER"}' for name in STATS_COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS replays_song ON replays (songHash, difficulty, playerId);
+CREATE INDEX IF NOT EXISTS replays_player ON replays (playerId, songHash);
+CREATE INDEX IF NOT EXISTS replays_score ON replays (songHash, difficulty, score_percent);
+'''
+
+
+def index_row(m: LazyBsor) -> Dict[str, Any]:
+    """Index columns of a replay except path, size, mtime_ns and error, only notes and walls get decoded."""
+    row = {'file_version': m.file_version}
+    for name in INFO_COLUMNS:
+        row[name] = getattr(m.info, name, None)
+    for name in COUNT_COLUMNS:
+        section = m.sections.get(name[:-len('_count')])
+        row[name] = section.count if section else 0
+    events = sorted([(n.event_time, n) for n in m.notes] + [(w.time, w) for w in m.walls], key=lambda x: x[0])
+    tracker = ScoreTracker()
+    tracker.add_all(e[1] for e in events)
+    row.update(end_score=tracker.score, max_score=tracker.max_score, score_percent=tracker.score_percent,
+               left_misses=tracker.misses[0], right_misses=tracker.misses[1],
+               left_bad_hits=tracker.bad_hits[0], right_bad_hits=tracker.bad_hits[1],
+               bomb_hits=tracker.bomb_hits, wall_hits=tracker.wall_hits)
+    return row
+
+
+def _bsor_paths(paths: Iterable[typing.Union[str, os.PathLike]]) -> Iterator[str]:
+    for p in paths:
+        p = os.path.abspath(p)
+        if os.path.isdir(p):
+            for root, _, files in os.walk(p):
+                for name in files:
+                    if name.endswith('.bsor'):
+                        yield os.path.join(root, name)
+        else:
+            yield p
+
+
+class ReplayIndex:
+    """Metadata of many bsor files in a sqlite database: Info fields, section counts, file size and mtime
+    and the end results of scoring, so searching an archive does not need to parse it.
+
+    update only parses files that are new or changed since the last update (by size and mtime), in a process
+    pool. Files that fail to parse are stored with error set and are retried when they change.
+    """
+
+    def __init__(self, db_path: typing.Union[str, os.PathLike] = ':memory:'):
+        self.db = sqlite3.connect(db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT count(*) FROM replays').fetchone()[0]
+
+    def update(self, paths: Iterable[typing.Union[str, os.PathLike]], workers: Optional[int] = None,
+               batch_size: int = 1000) -> int:
+        """Indexes the .bsor files in paths (files or directories, searched recursively) that are new or changed.
+
+        Returns how many files were (re)parsed. Every batch is committed, so an interrupted update keeps its work.
+        """
+        known = {row['path']: (row['size'], row['mtime_ns'])
+                 for row in self.db.execute('SELECT path, size, mtime_ns FROM replays')}
+        todo = []
+        for path in _bsor_paths(paths):
+            st = os.stat(path)
+            if known.get(path) != (st.st_size, st.st_mtime_ns):
+                todo.append((path, st.st_size, st.st_mtime_ns))
+        for i in range(0, len(todo), max(batch_size, 1)):
+            batch = todo[i:i + batch_size]
+            report = parse_many([p for p, _, _ in batch], workers=workers, reducer=index_row, lazy=True)
+            rows = []
+            for (path, size, mtime_ns), result in zip(batch, report.results):
+                row = dict.fromkeys(COLUMNS)
+                row.update(result.value or {})
+                row.update(path=path, size=size, mtime_ns=mtime_ns, error=result.error)
+                rows.append([row[name] for name in COLUMNS])
+            with self.db:
+                self.db.executemany(f'INSERT OR REPLACE INTO replays ({", ".join(COLUMNS)}) '
+                                    f'VALUES ({", ".join("?" * len(COLUMNS))})', rows)
+        return len(todo)
+
+    def prune(self) -> int:
+        """Removes entries of files that no longer exist, returns how many."""
+        gone = [(row['path'],) for row in self.db.execute('SELECT path FROM replays')
+                if not os.path.exists(row['path'])]
+        with self.db:
+            self.db.executemany('DELETE FROM replays WHERE path = ?', gone)
+        return len(gone)
+
+    def _where(self, filters: Dict[str, Any]) -> typing.Tuple[str, list]:
+        unknown = set(filters) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f'unknown columns {sorted(unknown)}, known columns are {COLUMNS}')
+        clauses = ['error IS NULL']
+        params = []
+        for name, value in filters.items():
+            if value is None:
+                clauses.append(f'{name} IS NULL')
+            else:
+                clauses.append(f'{name} = ?')
+                params.append(value)
+        return ' AND '.join(clauses), params
+
+    def rows(self, order_by: str = 'path', **filters) -> List[sqlite3.Row]:
+        """Entries whose columns equal the given values, e.g. rows(songHash=h, difficulty='ExpertPlus')."""
+        descending = order_by.startswith('-')
+        if order_by.lstrip('-') not in COLUMNS:
+            raise ValueError(f'can not order by {order_by}, known columns are {COLUMNS}')
+        where, params = self._where(filters)
+        return self.db.execute(f'SELECT * FROM replays WHERE {where} '
+                               f'ORDER BY {order_by.lstrip("-")}{" DESC" if descending else ""}', params).fetchall()
+
+    def paths(self, order_by: str = 'path', **filters) -> List[str]:
+        return [row['path'] for row in self.rows(order_by, **filters)]
+
+    def replays(self, order_by: str = 'path', frames: str = FRAMES_OBJECTS, **filters) -> Iterator[LazyBsor]:
+        """Matching replays, each opened as a LazyBsor when the iteration gets to it."""
+        for path in self.paths(order_by, **filters):
+            yield open_bsor(path, frames=frames, lazy=True)
+
+    def errors(self) -> List[sqlite3.Row]:
+        return self.db.execute('SELECT path, error FROM replays WHERE error IS NOT NULL ORDER BY path').fetchall()
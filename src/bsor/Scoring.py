@@ -1,6 +1,8 @@
 from .Bsor import *
 import json
-from typing import List, Tuple, Any, Union
+from array import array
+from bisect import bisect_right
+from typing import List, Tuple, Any, Union, Iterable
 
 
 def inc_mul(i, progress, max_progress):
@@ -29,17 +31,79 @@ def get_at_time(time: float, stat: List[Tuple], default: Any =(0.0, 0)) -> Tuple
         if t > time:
             return result
         result = (time, s)
+    return result
+
+
+class Timeline:
+    """(time, value) pairs appended in time order, kept as parallel arrays.
+
+    With width 1 values are ints, otherwise lists of width ints (e.g. [left, right]).
+    Indexing, slicing, iterating and comparing work with (time, value) tuples like the plain lists used before,
+    a slice is a list of such tuples.
+    """
+
+    def __init__(self, width: int = 1):
+        self.times = array('d')
+        self.values = [array('q') for _ in range(width)]
+
+    def append(self, time: float, *values: int):
+        self.times.append(time)
+        for column, v in zip(self.values, values):
+            column.append(v)
+
+    def value(self, i: int) -> Union[int, List[int]]:
+        if len(self.values) == 1:
+            return self.values[0][i]
+        return [column[i] for column in self.values]
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self.times))[i]]
+        return self.times[i], self.value(i)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self.times)))
+
+    def __eq__(self, other):
+        if isinstance(other, (Timeline, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def at_time(self, time: float, default: Tuple[float, Any]) -> Tuple[float, Any]:
+        # last entry at or before time, like get_at_time, in O(log n)
+        i = bisect_right(self.times, time) - 1
+        if i < 0:
+            return default
+        return time, self.value(i)
+
+    def at_times(self, times: Iterable[float], default: Tuple[float, Any]) -> List[Tuple[float, Any]]:
+        return [self.at_time(t, default) for t in times]
 
 
 class ScoreStats:
-    #all lists should be sorted by time
-    events: List[Union[Note, Wall]] = []
-    score_at_time: List[Tuple[float, int]] = []
-    max_score_at_time: List[Tuple[float, int]] = []
-    bomb_hit_at_time: List[Tuple[float, int]] = []
-    wall_hit_at_time: List[Tuple[float, int]] = []
-    miss_at_time: List[Tuple[float, List[int]]] = []
-    bad_hit_at_time: List[Tuple[float, List[int]]] = []
+    #all timelines are sorted by time
+    events: List[Tuple[float, Union[Note, Wall]]]
+    score_at_time: Timeline
+    max_score_at_time: Timeline
+    bomb_hit_at_time: Timeline
+    wall_hit_at_time: Timeline
+    miss_at_time: Timeline
+    bad_hit_at_time: Timeline
+
+    def __init__(self):
+        self.events = []
+        self.score_at_time = Timeline()
+        self.max_score_at_time = Timeline()
+        self.bomb_hit_at_time = Timeline()
+        self.wall_hit_at_time = Timeline()
+        self.miss_at_time = Timeline(2)
+        self.bad_hit_at_time = Timeline(2)
 
     def __str__(self):
         return json.dumps({
@@ -89,83 +153,145 @@ class ScoreStats:
         return self.bad_hit_at_time[-1][1]
 
     def get_score_at_time(self, time: float) -> Tuple[float, int]:
-        return get_at_time(time, self.score_at_time)
+        return self.score_at_time.at_time(time, (0.0, 0))
 
     def get_max_score_at_time(self, time: float) -> Tuple[float, int]:
-        return get_at_time(time, self.max_score_at_time)
+        return self.max_score_at_time.at_time(time, (0.0, 0))
 
     def get_bomb_hit_at_time(self, time: float) -> Tuple[float, int]:
-        return get_at_time(time, self.bomb_hit_at_time)
+        return self.bomb_hit_at_time.at_time(time, (0.0, 0))
 
     def get_wall_hit_at_time(self, time: float) -> Tuple[float, int]:
-        return get_at_time(time, self.wall_hit_at_time)
+        return self.wall_hit_at_time.at_time(time, (0.0, 0))
 
     def get_miss_at_time(self, time: float) -> Tuple[float,List[int]]:
-        return get_at_time(time, self.miss_at_time, (0.0, [0, 0]))
+        return self.miss_at_time.at_time(time, (0.0, [0, 0]))
 
     def get_bad_hit_at_time(self, time: float) -> Tuple[float,List[int]]:
-        return get_at_time(time, self.bad_hit_at_time, (0.0, [0, 0]))
+        return self.bad_hit_at_time.at_time(time, (0.0, [0, 0]))
 
     def get_percent_at_time(self, time: float) -> Tuple[float, float]:
         t, s = self.get_score_at_time(time)
         return t, s / self.get_max_score_at_time(time)[1]
 
+    def get_score_at_times(self, times: Iterable[float]) -> List[Tuple[float, int]]:
+        return self.score_at_time.at_times(times, (0.0, 0))
 
+    def get_max_score_at_times(self, times: Iterable[float]) -> List[Tuple[float, int]]:
+        return self.max_score_at_time.at_times(times, (0.0, 0))
 
-def calc_stats(m: Bsor) -> ScoreStats:
-    result = ScoreStats()
-    bad, miss = [0, 0], [0, 0]
-    bomb_hits = 0
-    wall_hits = 0
+    def get_bomb_hit_at_times(self, times: Iterable[float]) -> List[Tuple[float, int]]:
+        return self.bomb_hit_at_time.at_times(times, (0.0, 0))
 
-    combo = 0
-    score_events: list[tuple[float, Any]] = [(n.event_time, n) for n in m.notes]
-    score_events.extend([(w.time, w) for w in m.walls])
-    result.events = sorted(score_events, key=lambda x: x[0])
-    max_score = 0
-    multiplier = 1
-    mul_progress = 0
-    mul_max_progress = 2
-    score = 0
-    note_cnt = 0
-    sco_x = []
-    scores = []
-    for e in result.events:
-        if isinstance(e[1], Note):
+    def get_wall_hit_at_times(self, times: Iterable[float]) -> List[Tuple[float, int]]:
+        return self.wall_hit_at_time.at_times(times, (0.0, 0))
+
+    def get_miss_at_times(self, times: Iterable[float]) -> List[Tuple[float, List[int]]]:
+        return self.miss_at_time.at_times(times, (0.0, [0, 0]))
+
+    def get_bad_hit_at_times(self, times: Iterable[float]) -> List[Tuple[float, List[int]]]:
+        return self.bad_hit_at_time.at_times(times, (0.0, [0, 0]))
+
+    def get_percent_at_times(self, times: Iterable[float]) -> List[Tuple[float, float]]:
+        return [self.get_percent_at_time(t) for t in times]
+
+
+
+class ScoreTracker:
+    """Scores notes and walls one at a time, with the multiplier and combo rules of calc_stats.
+
+    Events (notes and walls) have to be added in time order. All counters are kept up to date, so reading them
+    is O(1). If stats is given, its timelines are appended to as events come in.
+    In a bsor file all walls come after all notes, so feeding stream_bsor records as they are read scores the
+    notes without the combo breaks of wall hits; for the calc_stats result add notes and walls sorted by time.
+    """
+    score: int
+    max_score: int
+    combo: int
+    multiplier: int
+    note_count: int
+    misses: List[int]
+    bad_hits: List[int]
+    bomb_hits: int
+    wall_hits: int
+
+    def __init__(self, stats: ScoreStats = None):
+        self.stats = stats
+        self.score = 0
+        self.max_score = 0
+        self.combo = 0
+        self.multiplier = 1
+        self.mul_progress = 0
+        self.mul_max_progress = 2
+        self.note_count = 0
+        self.misses = [0, 0]
+        self.bad_hits = [0, 0]
+        self.bomb_hits = 0
+        self.wall_hits = 0
+
+    @property
+    def score_percent(self) -> float:
+        if self.max_score == 0:
+            return 0.0
+        return self.score / self.max_score
+
+    def add(self, e: Union[Note, Wall]):
+        stats = self.stats
+        if isinstance(e, Note):
+            time = e.event_time
             #calculate max score
-            note_cnt = note_cnt + 1
+            self.note_count = self.note_count + 1
+            note_cnt = self.note_count
             max_mul = 8 if note_cnt > 8 + 4 + 2 else 4 if note_cnt > 4 + 2 else 2 if note_cnt > 2 else 1
-            if e[1].scoringType == NOTE_SCORE_TYPE_BURSTSLIDERELEMENT:
-                max_score = max_score + max_mul * 20
-            elif e[1].scoringType == NOTE_SCORE_TYPE_BURSTSLIDERHEAD:
-                max_score = max_score + max_mul * 85
+            if e.scoringType == NOTE_SCORE_TYPE_BURSTSLIDERELEMENT:
+                self.max_score = self.max_score + max_mul * 20
+            elif e.scoringType == NOTE_SCORE_TYPE_BURSTSLIDERHEAD:
+                self.max_score = self.max_score + max_mul * 85
             else:
-                max_score = max_score + max_mul * 115
-
-            result.max_score_at_time.append((e[1].event_time, max_score))
-
-            if e[1].event_type == NOTE_EVENT_BAD:
-                bad[e[1].cut.saberType] = bad[e[1].cut.saberType] + 1
-                result.bad_hit_at_time.append((e[1].event_time, bad.copy()))
-            elif e[1].event_type == NOTE_EVENT_MISS:
-                miss[e[1].colorType] = miss[e[1].colorType] + 1
-                result.miss_at_time.append((e[1].event_time, miss.copy()))
-            elif e[1].event_type == NOTE_EVENT_BOMB:
-                bomb_hits = bomb_hits + 1
-                result.bomb_hit_at_time.append((e[1].event_time, bomb_hits))
-        elif isinstance(e[1], Wall):
-            wall_hits = wall_hits + 1
-            result.wall_hit_at_time.append((e[1].event_time, wall_hits))
-        if isinstance(e[1], Wall) or isinstance(e[1], Note) and e[1].score == 0:
-            multiplier, mul_progress, mul_max_progress = dec_mul(multiplier, mul_progress, mul_max_progress)
-            combo = 0
+                self.max_score = self.max_score + max_mul * 115
+            if stats is not None:
+                stats.max_score_at_time.append(time, self.max_score)
+
+            if e.event_type == NOTE_EVENT_BAD:
+                self.bad_hits[e.cut.saberType] = self.bad_hits[e.cut.saberType] + 1
+                if stats is not None:
+                    stats.bad_hit_at_time.append(time, *self.bad_hits)
+            elif e.event_type == NOTE_EVENT_MISS:
+                self.misses[e.colorType] = self.misses[e.colorType] + 1
+                if stats is not None:
+                    stats.miss_at_time.append(time, *self.misses)
+            elif e.event_type == NOTE_EVENT_BOMB:
+                self.bomb_hits = self.bomb_hits + 1
+                if stats is not None:
+                    stats.bomb_hit_at_time.append(time, self.bomb_hits)
+        elif isinstance(e, Wall):
+            time = e.time
+            self.wall_hits = self.wall_hits + 1
+            if stats is not None:
+                stats.wall_hit_at_time.append(time, self.wall_hits)
         else:
-            multiplier, mul_progress, mul_max_progress = inc_mul(multiplier, mul_progress, mul_max_progress)
-            combo = combo + 1
-            score = score + multiplier * e[1].score
-        sco_x.append(e[1].event_time)
-        scores.append(score)
+            raise TypeError(f'only notes and walls can be scored, got {type(e).__name__}')
+        if isinstance(e, Wall) or e.score == 0:
+            self.multiplier, self.mul_progress, self.mul_max_progress = dec_mul(self.multiplier, self.mul_progress,
+                                                                                 self.mul_max_progress)
+            self.combo = 0
+        else:
+            self.multiplier, self.mul_progress, self.mul_max_progress = inc_mul(self.multiplier, self.mul_progress,
+                                                                                 self.mul_max_progress)
+            self.combo = self.combo + 1
+            self.score = self.score + self.multiplier * e.score
+        if stats is not None:
+            stats.score_at_time.append(time, self.score)
+
+    def add_all(self, events: Iterable[Union[Note, Wall]]):
+        for e in events:
+            self.add(e)
 
-    result.score_at_time = list(zip(sco_x, scores))
 
+def calc_stats(m: Bsor) -> ScoreStats:
+    result = ScoreStats()
+    score_events: list[tuple[float, Any]] = [(n.event_time, n) for n in m.notes]
+    score_events.extend([(w.time, w) for w in m.walls])
+    result.events = sorted(score_events, key=lambda x: x[0])
+    ScoreTracker(result).add_all(e[1] for e in result.events)
     return result
@@ -0,0 +1,149 @@
+from .Bsor import *
+from .Scoring import ScoreStats
+import numpy as np
+from typing import Tuple
+
+
+def _round_half_up(f: np.ndarray) -> np.ndarray:
+    # same as Bsor.round_half_up, including int() truncating towards zero
+    return np.where(np.mod(f, 1) < 0.5, np.trunc(f), np.trunc(f + 1)).astype(np.int64)
+
+
+def calc_note_scores(before_cut_rating, after_cut_rating, cut_distance_to_center, scoring_type,
+                     valid) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized calc_note_score, returns pre, post and acc score arrays.
+
+    valid is directionOk and saberTypeOk and speedOK of the cut, notes without a cut must be passed as not valid.
+    """
+    before = np.asarray(before_cut_rating, dtype=np.float64)
+    after = np.asarray(after_cut_rating, dtype=np.float64)
+    distance = np.asarray(cut_distance_to_center, dtype=np.float64)
+    scoring_type = np.asarray(scoring_type)
+    valid = np.asarray(valid, dtype=bool)
+
+    burst_element = scoring_type == NOTE_SCORE_TYPE_BURSTSLIDERELEMENT
+    pre = np.clip(_round_half_up(70 * before), 0, 70)
+    pre[scoring_type == NOTE_SCORE_TYPE_SLIDERTAIL] = 70
+    pre[burst_element] = 0
+
+    post = np.clip(_round_half_up(30 * after), 0, 30)
+    post[scoring_type == NOTE_SCORE_TYPE_SLIDERHEAD] = 30
+    post[burst_element | (scoring_type == NOTE_SCORE_TYPE_BURSTSLIDERHEAD)] = 0
+
+    acc = _round_half_up(15 * (1 - np.clip(distance / 0.3, 0, 1)))
+    acc[burst_element] = 20
+
+    invalid = ~valid
+    pre[invalid] = 0
+    post[invalid] = 0
+    acc[invalid] = 0
+    return pre, post, acc
+
+
+def score_notes(notes: List[Note]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pre, post and acc scores of notes in one pass, notes without a cut score 0."""
+    cnt = len(notes)
+    before, after, distance = np.zeros(cnt), np.zeros(cnt), np.zeros(cnt)
+    scoring_type = np.zeros(cnt, dtype=np.int64)
+    valid = np.zeros(cnt, dtype=bool)
+    for i, n in enumerate(notes):
+        scoring_type[i] = n.scoringType
+        c = n.cut
+        if c is not None:
+            before[i], after[i], distance[i] = c.beforeCutRating, c.afterCutRating, c.cutDistanceToCenter
+            valid[i] = c.directionOk and c.saberTypeOk and c.speedOK
+    return calc_note_scores(before, after, distance, scoring_type, valid)
+
+
+def _fill(timeline, times: np.ndarray, *columns: np.ndarray):
+    timeline.times.frombytes(np.ascontiguousarray(times, dtype=np.float64).tobytes())
+    for column, values in zip(timeline.values, columns):
+        column.frombytes(np.ascontiguousarray(values, dtype=np.int64).tobytes())
+
+
+def _multipliers(breaks: np.ndarray) -> np.ndarray:
+    # the inc_mul / dec_mul state machine, multiplier after each event
+    result = np.empty(len(breaks), dtype=np.int64)
+    multiplier, progress, max_progress = 1, 0, 2
+    for i, combo_break in enumerate(breaks.tolist()):
+        if combo_break:
+            progress = 0
+            if multiplier > 1:
+                multiplier = multiplier // 2
+            max_progress = multiplier * 2
+        elif multiplier < 8:
+            if progress < max_progress:
+                progress = progress + 1
+            if progress >= max_progress:
+                multiplier = multiplier * 2
+                progress = 0
+                max_progress = multiplier * 2
+        result[i] = multiplier
+    return result
+
+
+def calc_stats_columns(note_time, scoring_type, event_type, color_type, saber_type, note_score,
+                       wall_time) -> ScoreStats:
+    """calc_stats on columns, one entry per note (saber_type only matters for bad cuts) and per wall hit.
+
+    ScoreStats.events stays empty, there are no objects to put there.
+    """
+    note_time = np.asarray(note_time, dtype=np.float64)
+    wall_time = np.asarray(wall_time, dtype=np.float64)
+    note_cnt = len(note_time)
+
+    # same order as sorted() in calc_stats: by time, notes before walls on ties
+    times = np.concatenate([note_time, wall_time])
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    is_note = order < note_cnt
+    note_index = order[is_note]
+
+    scoring_type = np.asarray(scoring_type)[note_index]
+    event_type = np.asarray(event_type)[note_index]
+    color_type = np.asarray(color_type)[note_index]
+    saber_type = np.asarray(saber_type)[note_index]
+    score = np.asarray(note_score, dtype=np.int64)[note_index]
+    note_times = times[is_note]
+
+    result = ScoreStats()
+
+    count = np.arange(1, len(note_index) + 1)
+    max_mul = np.where(count > 8 + 4 + 2, 8, np.where(count > 4 + 2, 4, np.where(count > 2, 2, 1)))
+    points = np.where(scoring_type == NOTE_SCORE_TYPE_BURSTSLIDERELEMENT, 20,
+                      np.where(scoring_type == NOTE_SCORE_TYPE_BURSTSLIDERHEAD, 85, 115))
+    _fill(result.max_score_at_time, note_times, np.cumsum(max_mul * points))
+
+    bad = event_type == NOTE_EVENT_BAD
+    _fill(result.bad_hit_at_time, note_times[bad],
+          np.cumsum(saber_type[bad] == 0), np.cumsum(saber_type[bad] == 1))
+    miss = event_type == NOTE_EVENT_MISS
+    _fill(result.miss_at_time, note_times[miss],
+          np.cumsum(color_type[miss] == 0), np.cumsum(color_type[miss] == 1))
+    bomb = event_type == NOTE_EVENT_BOMB
+    _fill(result.bomb_hit_at_time, note_times[bomb], np.arange(1, np.count_nonzero(bomb) + 1))
+    _fill(result.wall_hit_at_time, times[~is_note], np.arange(1, len(wall_time) + 1))
+
+    event_score = np.zeros(len(times), dtype=np.int64)
+    event_score[is_note] = score
+    breaks = ~is_note | (event_score == 0)
+    gained = np.where(breaks, 0, _multipliers(breaks) * event_score)
+    _fill(result.score_at_time, times, np.cumsum(gained))
+    return result
+
+
+def calc_stats_columnar(m: Bsor) -> ScoreStats:
+    """Same result as Scoring.calc_stats, computed on columns of the notes and walls."""
+    notes, walls = m.notes, m.walls
+    result = calc_stats_columns(
+        [n.event_time for n in notes],
+        [n.scoringType for n in notes],
+        [n.event_type for n in notes],
+        [n.colorType for n in notes],
+        [0 if n.cut is None else n.cut.saberType for n in notes],
+        [n.score for n in notes],
+        [w.time for w in walls])
+    score_events = [(n.event_time, n) for n in notes]
+    score_events.extend([(w.time, w) for w in walls])
+    result.events = sorted(score_events, key=lambda x: x[0])
+    return result